@@ -1,15 +1,9 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from database import fetch_non_archived_data
+from database import fetch_sales_rollup, fetch_sales_history, fetch_product_sales, fetch_sales_extremes, fetch_monthly_sales_increase
 
 def plot_total_sales():
-    invoices_df, _ = fetch_non_archived_data()
-    invoices_df["date_time"] = pd.to_datetime(invoices_df["date_time"])
-    invoices_df["month"] = invoices_df["date_time"].dt.to_period("M")
-    invoices_df["year"] = invoices_df["date_time"].dt.to_period("Y")
-    
-    monthly_sales = invoices_df.groupby("month")["total"].sum()
-    yearly_sales = invoices_df.groupby("year")["total"].sum()
+    monthly_sales = fetch_sales_rollup("monthly")
+    yearly_sales = fetch_sales_rollup("yearly")
     
     fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 5))
     
@@ -26,10 +20,27 @@ def plot_total_sales():
     plt.tight_layout()
     plt.show()
 
+def plot_sales_trend():
+    monthly_sales = fetch_sales_history("monthly")
+    yearly_sales = fetch_sales_history("yearly")
+    
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
+    
+    monthly_sales.plot(kind="line", ax=ax1, color="skyblue", marker="o")
+    ax1.set_title("Monthly Sales (including exported archives)")
+    ax1.set_xlabel("Month")
+    ax1.set_ylabel("Total Sales")
+    
+    yearly_sales.plot(kind="bar", ax=ax2, color="lightgreen")
+    ax2.set_title("Yearly Sales (including exported archives)")
+    ax2.set_xlabel("Year")
+    ax2.set_ylabel("Total Sales")
+    
+    plt.tight_layout()
+    plt.show()
+
 def plot_item_wise_sales():
-    _, items_df = fetch_non_archived_data()
-    items_df["total_amount"] = items_df["quantity"] * items_df["price"]
-    item_wise_sales = items_df.groupby("product")["total_amount"].sum()
+    item_wise_sales = fetch_product_sales()
     
     plt.figure(figsize=(8, 5))
     item_wise_sales.plot(kind="bar", color="orange")
@@ -40,9 +51,7 @@ def plot_item_wise_sales():
     plt.show()
 
 def plot_highest_lowest():
-    invoices_df, _ = fetch_non_archived_data()
-    highest = invoices_df["total"].max()
-    lowest = invoices_df["total"].min()
+    highest, lowest = fetch_sales_extremes()
     
     plt.figure(figsize=(6, 4))
     plt.bar(["Highest", "Lowest"], [highest, lowest], color=["green", "red"])
@@ -52,12 +61,7 @@ def plot_highest_lowest():
     plt.show()
 
 def plot_monthly_increase():
-    invoices_df, _ = fetch_non_archived_data()
-    invoices_df["date_time"] = pd.to_datetime(invoices_df["date_time"])
-    invoices_df["month"] = invoices_df["date_time"].dt.to_period("M")
-    
-    monthly_sales = invoices_df.groupby("month")["total"].sum()
-    monthly_increase = monthly_sales.diff().fillna(0)
+    monthly_increase = fetch_monthly_sales_increase()
     
     plt.figure(figsize=(8, 5))
     monthly_increase.plot(kind="bar", color="purple")
@@ -0,0 +1,115 @@
+from utils import ARCHIVE_DB_PATH
+from connection import get_connection, transaction
+
+ARCHIVE_TABLES = ("archived_invoices", "archived_invoice_items", "archive_backups")
+
+def create_archive_schema(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS archive.archived_invoices (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        original_id INTEGER,
+                        customer TEXT,
+                        total REAL,
+                        total_paise INTEGER,
+                        invoice_number TEXT,
+                        date_time TEXT,
+                        invoice_date TEXT,
+                        customer_email TEXT,
+                        customer_contact TEXT,
+                        archive_timestamp TEXT,
+                        pdf_path TEXT,
+                        pdf_bundle TEXT,
+                        tax_paise INTEGER NOT NULL DEFAULT 0,
+                        place_of_supply TEXT)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS archive.archived_invoice_items (
+                        id INTEGER PRIMARY KEY,
+                        invoice_id INTEGER,
+                        product TEXT,
+                        quantity INTEGER,
+                        price REAL,
+                        price_paise INTEGER,
+                        hsn_code TEXT,
+                        gst_rate INTEGER NOT NULL DEFAULT 0,
+                        cgst_paise INTEGER NOT NULL DEFAULT 0,
+                        sgst_paise INTEGER NOT NULL DEFAULT 0,
+                        igst_paise INTEGER NOT NULL DEFAULT 0,
+                        archive_timestamp TEXT)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS archive.archive_backups (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        archive_timestamp TEXT,
+                        date_limit TEXT,
+                        max_invoice_id INTEGER,
+                        status TEXT NOT NULL DEFAULT 'done',
+                        moved INTEGER NOT NULL DEFAULT 0,
+                        export INTEGER NOT NULL DEFAULT 0)''')
+    if "export" not in table_columns(cursor, "archive", "archive_backups"):
+        cursor.execute("ALTER TABLE archive.archive_backups ADD COLUMN export INTEGER NOT NULL DEFAULT 0")
+    # pdf_bundle is the zip (relative to the archive PDF directory) holding the invoice's PDF under pdf_path
+    invoice_columns = table_columns(cursor, "archive", "archived_invoices")
+    for column in ("pdf_path", "pdf_bundle"):
+        if column not in invoice_columns:
+            cursor.execute(f"ALTER TABLE archive.archived_invoices ADD COLUMN {column} TEXT")
+    if "total_paise" not in invoice_columns:
+        cursor.execute("ALTER TABLE archive.archived_invoices ADD COLUMN total_paise INTEGER")
+        cursor.execute("UPDATE archive.archived_invoices SET total_paise = CAST(ROUND(total * 100) AS INTEGER)")
+    for column, definition in (("tax_paise", "INTEGER NOT NULL DEFAULT 0"), ("place_of_supply", "TEXT")):
+        if column not in invoice_columns:
+            cursor.execute(f"ALTER TABLE archive.archived_invoices ADD COLUMN {column} {definition}")
+    item_columns = table_columns(cursor, "archive", "archived_invoice_items")
+    if "price_paise" not in item_columns:
+        cursor.execute("ALTER TABLE archive.archived_invoice_items ADD COLUMN price_paise INTEGER")
+        cursor.execute("UPDATE archive.archived_invoice_items SET price_paise = CAST(ROUND(price * 100) AS INTEGER)")
+    for column in ("hsn_code", "gst_rate", "cgst_paise", "sgst_paise", "igst_paise"):
+        if column not in item_columns:
+            definition = "TEXT" if column == "hsn_code" else "INTEGER NOT NULL DEFAULT 0"
+            cursor.execute(f"ALTER TABLE archive.archived_invoice_items ADD COLUMN {column} {definition}")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_archived_invoices_archive_timestamp ON archived_invoices(archive_timestamp)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_archived_invoices_original_id ON archived_invoices(original_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_archived_invoice_items_invoice_id ON archived_invoice_items(invoice_id)")
+
+def attach_archive():
+    # The archive lives in its own file so the live database stays small; it is attached to the
+    # thread's connection the first time archived data is needed (never inside a transaction)
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA database_list")
+    if not any(row[1] == "archive" for row in cursor.fetchall()):
+        cursor.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_PATH,))
+        cursor.execute("PRAGMA archive.journal_mode = WAL")
+        cursor.execute("PRAGMA archive.synchronous = NORMAL")
+        with transaction() as cursor:
+            create_archive_schema(cursor)
+    return conn
+
+def table_columns(cursor, schema, table):
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+def migrate_legacy_archive():
+    # Older databases kept the archive tables inside invoices.db. Rows are copied first and the old
+    # tables dropped in a second transaction; primary keys are preserved so a rerun never duplicates.
+    # The archive is only attached when there is something to move into it
+    cursor = get_connection().cursor()
+    cursor.execute(f"SELECT name FROM main.sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(ARCHIVE_TABLES))})", ARCHIVE_TABLES)
+    legacy_tables = [row[0] for row in cursor.fetchall()]
+    if not legacy_tables:
+        return
+    attach_archive()
+    
+    with transaction(immediate=True) as cursor:
+        for table in legacy_tables:
+            archive_columns = table_columns(cursor, "archive", table)
+            columns = ", ".join(column for column in table_columns(cursor, "main", table) if column in archive_columns)
+            cursor.execute(f"INSERT OR IGNORE INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table}")
+        
+        # Archives made before items were moved left them behind in invoice_items
+        cursor.execute('''INSERT OR IGNORE INTO archive.archived_invoice_items (id, invoice_id, product, quantity, price, price_paise)
+                          SELECT id, invoice_id, product, quantity, price, price_paise FROM main.invoice_items
+                          WHERE invoice_id NOT IN (SELECT id FROM main.invoices)''')
+        # Legacy archive tables predate the paise columns
+        cursor.execute("UPDATE archive.archived_invoices SET total_paise = CAST(ROUND(total * 100) AS INTEGER) WHERE total_paise IS NULL")
+        cursor.execute("UPDATE archive.archived_invoice_items SET price_paise = CAST(ROUND(price * 100) AS INTEGER) WHERE price_paise IS NULL")
+    
+    with transaction(immediate=True) as cursor:
+        cursor.execute("DELETE FROM main.invoice_items WHERE invoice_id NOT IN (SELECT id FROM main.invoices)")
+        for table in legacy_tables:
+            cursor.execute(f"DROP TABLE main.{table}")
@@ -0,0 +1,135 @@
+import os
+import glob
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from utils import ARCHIVE_EXPORT_DIR
+from archive_db import attach_archive
+from money import grouped_sum, line_amounts, paise_array
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Column name -> NumPy dtype; date_time is copied onto items so both files can be pruned by date
+EXPORT_COLUMNS = {
+    "invoices": {"original_id": "int64", "invoice_number": "str", "customer": "str", "total_paise": "int64", "date_time": "datetime64[s]"},
+    "items": {"invoice_id": "int64", "product": "str", "quantity": "int64", "price_paise": "int64", "date_time": "datetime64[s]"},
+}
+EXPORT_QUERIES = {
+    "invoices": '''SELECT original_id, invoice_number, customer, total_paise, date_time FROM archive.archived_invoices
+                   WHERE archive_timestamp = ? ORDER BY date_time''',
+    "items": '''SELECT it.invoice_id, it.product, it.quantity, it.price_paise, ai.date_time FROM archive.archived_invoice_items it
+                JOIN archive.archived_invoices ai ON ai.original_id = it.invoice_id
+                WHERE ai.archive_timestamp = ? ORDER BY ai.date_time''',
+}
+PERIOD_UNITS = {"daily": "D", "monthly": "M", "yearly": "Y"}
+ROW_GROUP_SIZE = 65536
+
+def archive_stamp(archive_timestamp):
+    # Archive timestamps as used in file names
+    return archive_timestamp.replace(":", "-").replace(" ", "_")
+
+def export_path(archive_timestamp, kind, extension):
+    return os.path.join(ARCHIVE_EXPORT_DIR, f"{archive_stamp(archive_timestamp)}.{kind}.{extension}")
+
+def to_array(values, dtype):
+    if dtype == "str":
+        return np.array([value or "" for value in values], dtype=str)
+    if dtype == "int64":
+        return np.array([value or 0 for value in values], dtype=np.int64)
+    return np.array(values, dtype=dtype)
+
+def write_columns(archive_timestamp, kind, columns):
+    # Written beside the target and renamed into place so a scan never sees half a file
+    if pq is not None:
+        path = export_path(archive_timestamp, kind, "parquet")
+        table = pa.table({name: pa.array(values) for name, values in columns.items()})
+        pq.write_table(table, path + ".tmp", compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    else:
+        path = export_path(archive_timestamp, kind, "npz")
+        dates = columns["date_time"][~np.isnat(columns["date_time"])]
+        bounds = np.array([dates.min(), dates.max()] if len(dates) else [], dtype="datetime64[s]")
+        with open(path + ".tmp", "wb") as file:
+            np.savez_compressed(file, bounds=bounds, **columns)
+    os.replace(path + ".tmp", path)
+    return path
+
+def export_archive(archive_timestamp):
+    # Snapshot one archive batch into a pair of columnar files sorted by date, so row groups (or
+    # whole files) outside a requested date range are skipped without being decompressed
+    os.makedirs(ARCHIVE_EXPORT_DIR, exist_ok=True)
+    cursor = attach_archive().cursor()
+    paths = []
+    for kind, dtypes in EXPORT_COLUMNS.items():
+        cursor.execute(EXPORT_QUERIES[kind], (archive_timestamp,))
+        rows = cursor.fetchall()
+        columns = {name: to_array([row[index] for row in rows], dtype) for index, (name, dtype) in enumerate(dtypes.items())}
+        paths.append(write_columns(archive_timestamp, kind, columns))
+    return paths
+
+def parse_bound(value):
+    return np.datetime64(value, "s") if value else None
+
+def legacy_column(name):
+    # Exports written before amounts were kept in paise hold float rupee columns instead
+    return name[:-len("_paise")] if name.endswith("_paise") else None
+
+def scan_parquet(path, columns, start, end):
+    filters = []
+    if start is not None:
+        filters.append(("date_time", ">=", start.astype(datetime)))
+    if end is not None:
+        filters.append(("date_time", "<", end.astype(datetime)))
+    names = pq.read_schema(path).names
+    read = [name if name in names else legacy_column(name) for name in columns]
+    table = pq.read_table(path, columns=read, filters=filters or None)
+    return {name: table.column(name).to_numpy() if name == source else paise_array(table.column(source).to_numpy())
+            for name, source in zip(columns, read)}
+
+def scan_npz(path, columns, start, end):
+    # NpzFile decompresses members lazily, so only the bounds and requested columns are read
+    with np.load(path) as data:
+        bounds = data["bounds"]
+        if not len(bounds) or (start is not None and bounds[1] < start) or (end is not None and bounds[0] >= end):
+            return None
+        dates = data["date_time"]
+        mask = ~np.isnat(dates)
+        if start is not None:
+            mask &= dates >= start
+        if end is not None:
+            mask &= dates < end
+        return {name: data[name][mask] if name in data.files else paise_array(data[legacy_column(name)][mask])
+                for name in columns}
+
+def scan_archive_exports(kind, columns, start=None, end=None):
+    # Returns the requested columns of every exported batch, limited to start <= date_time < end
+    start, end = parse_bound(start), parse_bound(end)
+    scanned = []
+    for path in sorted(glob.glob(os.path.join(ARCHIVE_EXPORT_DIR, f"*.{kind}.*"))):
+        if path.endswith(".parquet"):
+            if pq is None:
+                continue
+            scanned.append(scan_parquet(path, columns, start, end))
+        elif path.endswith(".npz"):
+            scanned.append(scan_npz(path, columns, start, end))
+    scanned = [part for part in scanned if part is not None]
+    if not scanned:
+        return {name: np.array([], dtype=EXPORT_COLUMNS[kind][name]) for name in columns}
+    return {name: np.concatenate([part[name] for part in scanned]) for name in columns}
+
+def fetch_archived_sales(period, start=None, end=None):
+    # Both fetchers return int64 paise
+    columns = scan_archive_exports("invoices", ["date_time", "total_paise"], start, end)
+    dates = columns["date_time"].astype("datetime64[s]")
+    known = ~np.isnat(dates)
+    labels = np.datetime_as_string(dates[known].astype(f"datetime64[{PERIOD_UNITS[period]}]"))
+    keys, totals = grouped_sum(labels, columns["total_paise"][known])
+    return pd.Series(totals, index=pd.Index(keys, name=period), name="total")
+
+def fetch_archived_product_sales(start=None, end=None):
+    columns = scan_archive_exports("items", ["product", "quantity", "price_paise"], start, end)
+    keys, totals = grouped_sum(columns["product"].astype(str), line_amounts(columns["quantity"], columns["price_paise"]))
+    return pd.Series(totals, index=pd.Index(keys, name="product"), name="total_amount")
@@ -0,0 +1,128 @@
+import os
+from datetime import datetime, timedelta
+from utils import ARCHIVE_DB_PATH
+from connection import transaction
+from archive_db import attach_archive
+from rollups import remove_from_rollups
+from archive_export import export_archive
+from archive_pdfs import pack_archived_pdfs
+
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_PERIODS = {
+    "last_year": 365,
+    "last_6_months": 180,
+    "last_1_month": 30,
+    "all_data": None,
+}
+
+def archive_date_limit(period):
+    if period not in ARCHIVE_PERIODS:
+        raise ValueError(f"Invalid archive period: {period}")
+    days = ARCHIVE_PERIODS[period]
+    return (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d") if days else None
+
+def start_archive(period, export=False):
+    date_limit = archive_date_limit(period)
+    archive_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    # Invoices created after the job starts are never swept into it
+    attach_archive()
+    with transaction(immediate=True) as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM main.invoices")
+        max_invoice_id = cursor.fetchone()[0]
+        cursor.execute('''INSERT INTO archive.archive_backups (archive_timestamp, date_limit, max_invoice_id, status, moved, export)
+                          VALUES (?, ?, ?, 'running', 0, ?)''', (archive_timestamp, date_limit, max_invoice_id, int(export)))
+    return archive_timestamp
+
+def pending_archives():
+    # Checked at every start-up, so a database that has never been archived is not attached (or created) for it
+    if not os.path.exists(ARCHIVE_DB_PATH):
+        return []
+    cursor = attach_archive().cursor()
+    cursor.execute("SELECT archive_timestamp FROM archive.archive_backups WHERE status = 'running' ORDER BY id")
+    return [row[0] for row in cursor.fetchall()]
+
+def load_archive_job(cursor, archive_timestamp):
+    cursor.execute("SELECT date_limit, max_invoice_id, moved, export FROM archive.archive_backups WHERE archive_timestamp = ?", (archive_timestamp,))
+    return cursor.fetchone()
+
+def job_condition(date_limit, max_invoice_id):
+    if date_limit:
+        return "id <= ? AND invoice_date <= ?", (max_invoice_id, date_limit)
+    return "id <= ?", (max_invoice_id,)
+
+def count_remaining(cursor, date_limit, max_invoice_id):
+    # Invoices an interrupted batch already copied are counted in moved, not here. NOT EXISTS rather than
+    # NOT IN: legacy archived rows have no original_id, and one NULL would make NOT IN exclude everything
+    where, params = job_condition(date_limit, max_invoice_id)
+    cursor.execute(f'''SELECT COUNT(*) FROM main.invoices WHERE {where}
+                       AND NOT EXISTS (SELECT 1 FROM archive.archived_invoices a WHERE a.original_id = main.invoices.id)''', params)
+    return cursor.fetchone()[0]
+
+def archive_batch(archive_timestamp, date_limit, max_invoice_id, batch_size=ARCHIVE_BATCH_SIZE):
+    # Returns (invoices taken off the live database, invoices newly copied into the archive); the two
+    # differ only when a batch interrupted after its copy is replayed
+    where, params = job_condition(date_limit, max_invoice_id)
+    attach_archive()
+    
+    # Transactions spanning two WAL databases are not atomic, so each batch is copied into the
+    # archive and committed before it is removed from the live database. Replaying a batch after
+    # a crash is harmless: original ids are unique in the archive and the copy is ignored
+    with transaction(immediate=True) as cursor:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.archive_batch")
+        cursor.execute(f"INSERT INTO temp.archive_batch (id) SELECT id FROM main.invoices WHERE {where} ORDER BY id LIMIT ?", (*params, batch_size))
+        batch = cursor.rowcount
+        if not batch:
+            return 0, 0
+        
+        cursor.execute('''INSERT OR IGNORE INTO archive.archived_invoices
+                          (original_id, customer, total, total_paise, tax_paise, invoice_number, date_time, invoice_date,
+                           customer_email, customer_contact, place_of_supply, pdf_path, archive_timestamp)
+                          SELECT id, customer, total, total_paise, tax_paise, invoice_number, date_time, invoice_date,
+                                 customer_email, customer_contact, place_of_supply, pdf_path, ?
+                          FROM main.invoices WHERE id IN (SELECT id FROM temp.archive_batch)''', (archive_timestamp,))
+        moved = cursor.rowcount
+        cursor.execute('''INSERT OR IGNORE INTO archive.archived_invoice_items
+                          (id, invoice_id, product, quantity, price, price_paise, hsn_code, gst_rate, cgst_paise, sgst_paise, igst_paise, archive_timestamp)
+                          SELECT id, invoice_id, product, quantity, price, price_paise, hsn_code, gst_rate, cgst_paise, sgst_paise, igst_paise, ?
+                          FROM main.invoice_items
+                          WHERE invoice_id IN (SELECT id FROM temp.archive_batch)''', (archive_timestamp,))
+        cursor.execute("UPDATE archive.archive_backups SET moved = moved + ? WHERE archive_timestamp = ?", (moved, archive_timestamp))
+    
+    # PDFs are packed only once their rows are safely in the archive, and before the rows leave the live database
+    packed = pack_archived_pdfs(cursor, archive_timestamp)
+    
+    with transaction(immediate=True) as cursor:
+        cursor.executemany("UPDATE archive.archived_invoices SET pdf_bundle = ?, pdf_path = ? WHERE original_id = ?", packed)
+        remove_from_rollups(cursor, "id IN (SELECT id FROM temp.archive_batch)", ())
+        # Invoices go first so the search-index trigger on invoice_items has nothing left to update
+        cursor.execute("DELETE FROM main.invoices WHERE id IN (SELECT id FROM temp.archive_batch)")
+        cursor.execute("DELETE FROM main.invoice_items WHERE invoice_id IN (SELECT id FROM temp.archive_batch)")
+        cursor.execute("DELETE FROM main.pdf_render_cache WHERE invoice_id IN (SELECT id FROM temp.archive_batch)")
+    return batch, moved
+
+def run_archive(archive_timestamp, progress=None, batch_size=ARCHIVE_BATCH_SIZE):
+    cursor = attach_archive().cursor()
+    date_limit, max_invoice_id, moved, export = load_archive_job(cursor, archive_timestamp)
+    total = moved + count_remaining(cursor, date_limit, max_invoice_id)
+    if progress:
+        progress(moved, total)
+    
+    while True:
+        batch, batch_moved = archive_batch(archive_timestamp, date_limit, max_invoice_id, batch_size)
+        if not batch:
+            break
+        moved += batch_moved
+        if progress:
+            progress(moved, total)
+    
+    # The job stays 'running' until its snapshot is written, so a failed export is retried on resume
+    if export:
+        export_archive(archive_timestamp)
+    with transaction() as cursor:
+        cursor.execute("UPDATE archive.archive_backups SET status = 'done' WHERE archive_timestamp = ?", (archive_timestamp,))
+    return moved
+
+def archive_period(period, progress=None, batch_size=ARCHIVE_BATCH_SIZE, export=False):
+    return run_archive(start_archive(period, export), progress, batch_size)
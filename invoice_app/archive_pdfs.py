@@ -0,0 +1,87 @@
+import os
+import tempfile
+import zipfile
+from utils import ARCHIVE_PDF_DIR
+from archive_db import attach_archive
+from archive_export import archive_stamp
+from pdf_sinks import PDF_DIR, FileSystemSink, create_sink, invoice_pdf_path, sync_file, sync_directories
+
+EXTRACT_DIR = os.path.join(tempfile.gettempdir(), "archived_invoices")
+
+def bundle_location(bundle):
+    return os.path.join(ARCHIVE_PDF_DIR, *bundle.split("/"))
+
+def write_bundle(path, documents):
+    # Written next to its final name and renamed once synced, so a bundle that exists is always complete.
+    # documents yields (member, data) pairs; returns the members written, and writes nothing if there are none
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    members = set()
+    with open(path + ".tmp", "wb") as file:
+        with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+            for member, data in documents:
+                bundle.writestr(member, data)
+                members.add(member)
+        sync_file(file)
+    if not members:
+        os.remove(path + ".tmp")
+        return members
+    os.replace(path + ".tmp", path)
+    sync_directories([os.path.dirname(path)])
+    return members
+
+def pack_archived_pdfs(cursor, archive_timestamp, directory=PDF_DIR):
+    # Packs the PDFs of the invoices in temp.archive_batch into one zip per batch, reading each from the sink
+    # its render was recorded against (the PDF directory if none was), and removes the loose files of the
+    # file system sink. Returns (bundle, member, invoice id) rows for the archive index. A replayed batch
+    # finds its bundle already written and only reads back which invoices it holds
+    cursor.execute('''SELECT i.id, i.invoice_number, i.invoice_date, i.pdf_path, c.sink, c.sink_target
+                      FROM main.invoices i LEFT JOIN main.pdf_render_cache c ON c.invoice_id = i.id
+                      WHERE i.id IN (SELECT id FROM temp.archive_batch) ORDER BY i.id''')
+    rows = []
+    sources = {}
+    for invoice_id, invoice_number, invoice_date, pdf_path, kind, target in cursor.fetchall():
+        pdf_path = pdf_path or invoice_pdf_path(invoice_number, invoice_date)
+        rows.append((invoice_id, pdf_path))
+        sources.setdefault((kind, target) if kind else ("filesystem", directory), []).append(pdf_path)
+    if not rows:
+        return []
+
+    sinks = {source: create_sink(*source) for source in sources}
+    bundle = f"{archive_stamp(archive_timestamp)}/{rows[0][0]:010d}.zip"
+    path = bundle_location(bundle)
+    if os.path.exists(path):
+        with zipfile.ZipFile(path) as existing:
+            members = set(existing.namelist())
+    else:
+        members = write_bundle(path, (document for source, names in sources.items() for document in sinks[source].read_batch(names)))
+        if not members:
+            return []
+
+    for source, names in sources.items():
+        sink = sinks[source]
+        if isinstance(sink, FileSystemSink):
+            for name in names:
+                if name in members and sink.exists(name):
+                    os.remove(sink.location(name))
+    return [(bundle, pdf_path, invoice_id) for invoice_id, pdf_path in rows if pdf_path in members]
+
+def extract_archived_pdf(archived_invoice_id):
+    # Reads one member through the zip's central directory; the rest of the bundle is never touched
+    cursor = attach_archive().cursor()
+    cursor.execute("SELECT invoice_number, pdf_path, pdf_bundle FROM archive.archived_invoices WHERE id = ?", (archived_invoice_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise LookupError(f"Archived invoice {archived_invoice_id} does not exist")
+    invoice_number, pdf_path, bundle = row
+    if not bundle:
+        raise LookupError(f"No PDF was archived for invoice {invoice_number}")
+
+    target = os.path.join(EXTRACT_DIR, os.path.basename(pdf_path))
+    with zipfile.ZipFile(bundle_location(bundle)) as archive:
+        info = archive.getinfo(pdf_path)
+        if not (os.path.exists(target) and os.path.getsize(target) == info.file_size):
+            os.makedirs(EXTRACT_DIR, exist_ok=True)
+            with open(target + ".tmp", "wb") as file:
+                file.write(archive.read(info))
+            os.replace(target + ".tmp", target)
+    return target
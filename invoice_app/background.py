@@ -0,0 +1,44 @@
+import queue
+import threading
+from connection import close_connection
+
+POLL_INTERVAL_MS = 100
+
+class BackgroundTask:
+    # Runs func(progress) on a worker thread; progress, completion and errors are
+    # delivered back on the Tk event loop through root.after polling
+    def __init__(self, root, func, on_progress=None, on_done=None, on_error=None):
+        self.root = root
+        self.events = queue.Queue()
+        self.handlers = {"progress": on_progress, "done": on_done, "error": on_error}
+        self.thread = threading.Thread(target=self._run, args=(func,), daemon=True)
+        self.thread.start()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def running(self):
+        return self.thread.is_alive()
+
+    def _run(self, func):
+        try:
+            result = func(lambda *args: self.events.put(("progress", args)))
+        except Exception as exc:
+            self.events.put(("error", (exc,)))
+        else:
+            self.events.put(("done", (result,)))
+        finally:
+            # Each task gets a fresh thread, so its SQLite connection is closed rather than left to the GC
+            close_connection()
+
+    def _poll(self):
+        finished = False
+        while True:
+            try:
+                kind, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            handler = self.handlers[kind]
+            if handler:
+                handler(*args)
+            finished = finished or kind != "progress"
+        if not finished:
+            self.root.after(POLL_INTERVAL_MS, self._poll)
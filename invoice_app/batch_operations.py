@@ -0,0 +1,165 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from connection import get_connection, transaction
+from pdf_renderer import fetch_org_info, build_org_header, render_invoice_pdf, get_org_header, invoice_render_key, record_renders
+from pdf_sinks import FileSystemSink
+from invoice_draft import InvoiceDraft, save_drafts
+from invoice_template import DEFAULT_TEMPLATE, get_render_plan
+from money import to_paise, line_amount
+from gst import get_rate_table, normalize_hsn
+
+DEFAULT_CHUNK_SIZE = 1000
+WRITE_BATCH_SIZE = 200
+CSV_FIELDS = ["invoice_ref", "customer", "customer_email", "customer_contact", "invoice_date", "place_of_supply",
+              "product", "quantity", "price", "hsn_code"]
+
+_worker_org_header = None
+
+def parse_item(product, quantity, price, hsn_code, source):
+    if not product:
+        raise ValueError(f"{source}: product is required")
+    try:
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"{source}: quantity must be a positive integer")
+    try:
+        price = to_paise(price)
+        if price <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError(f"{source}: price must be a positive number")
+    try:
+        line_amount(quantity, price)
+        hsn_code = normalize_hsn(hsn_code)
+    except ValueError as exc:
+        raise ValueError(f"{source}: {exc}")
+    return product, quantity, price, hsn_code
+
+def new_invoice(record, source):
+    try:
+        return InvoiceDraft(record.get("customer"), record.get("customer_email"), record.get("customer_contact"), record.get("invoice_date"),
+                            place_of_supply=record.get("place_of_supply"))
+    except ValueError as exc:
+        raise ValueError(f"{source}: {exc}")
+
+def read_invoices_csv(path):
+    # One row per line item; rows sharing an invoice_ref belong to the same invoice
+    invoices = {}
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        # A misspelt header would otherwise leave its column silently empty (an hsn column meaning no GST)
+        unknown = [field for field in reader.fieldnames or [] if field not in CSV_FIELDS]
+        if unknown:
+            raise ValueError(f"{path}: unknown column(s) {', '.join(unknown)}; expected {', '.join(CSV_FIELDS)}")
+        for line_number, row in enumerate(reader, start=2):
+            source = f"{path}:{line_number}"
+            ref = (row.get("invoice_ref") or "").strip() or f"row-{line_number}"
+            if ref not in invoices:
+                invoices[ref] = new_invoice(row, source)
+            invoices[ref].add_item(*parse_item(row.get("product"), row.get("quantity"), row.get("price"), row.get("hsn_code"), source))
+    return list(invoices.values())
+
+def read_invoices_jsonl(path):
+    invoices = []
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            source = f"{path}:{line_number}"
+            record = json.loads(line)
+            invoice = new_invoice(record, source)
+            for item in record.get("items", []):
+                invoice.add_item(*parse_item(item.get("product"), item.get("quantity"), item.get("price"), item.get("hsn_code"), source))
+            invoices.append(invoice)
+    return invoices
+
+def check_hsn_codes(invoices, path):
+    # Every distinct code in the file is rated in one lookup, so an unlisted code fails the import up front
+    unknown = get_rate_table().unknown([item[3] for invoice in invoices for item in invoice.items])
+    if unknown:
+        raise ValueError(f"{path}: no GST rate for HSN/SAC code(s) {', '.join(unknown)}")
+    return invoices
+
+def read_invoices(path):
+    if path.lower().endswith((".jsonl", ".json")):
+        return check_hsn_codes(read_invoices_jsonl(path), path)
+    return check_hsn_codes(read_invoices_csv(path), path)
+
+def insert_invoices(invoices, chunk_size=DEFAULT_CHUNK_SIZE):
+    jobs = []
+    
+    for start in range(0, len(invoices), chunk_size):
+        chunk = invoices[start:start + chunk_size]
+        # One transaction and one block of invoice numbers per chunk
+        with transaction(immediate=True) as cursor:
+            saved = save_drafts(cursor, chunk)
+        jobs.extend((invoice_id, draft.lines(), draft.customer, draft.grand_total, invoice_number, draft.invoice_date,
+                     draft.customer_email, draft.customer_contact, draft.place_of_supply, pdf_path)
+                    for (invoice_id, invoice_number, pdf_path), draft in zip(saved, chunk))
+    
+    return jobs
+
+def _init_worker(org_info, template):
+    global _worker_org_header
+    _worker_org_header = build_org_header(org_info, get_render_plan(template))
+
+def _render_job(job):
+    # Workers only render; the PDF bytes go back to the parent, which owns all writes to the sink
+    invoice_id, items, customer, total, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply, pdf_path = job
+    try:
+        data = render_invoice_pdf(items, _worker_org_header, customer, total, invoice_number, invoice_date,
+                                  customer_email, customer_contact, place_of_supply)
+    except Exception as exc:
+        return invoice_number, pdf_path, None, str(exc)
+    return invoice_number, pdf_path, data, None
+
+def job_render_key(job, org_header):
+    # The key ensure_invoice_pdf computes from the saved rows, built from the job that holds the same values
+    invoice_id, items, customer, total, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply, pdf_path = job
+    invoice = (customer, total, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply)
+    return invoice_render_key(invoice, items, org_header)
+
+def write_rendered(sink, batch, org_header, template):
+    # batch: (job, pdf bytes); the render keys go in once the batch is safely in the sink
+    sink.write_batch([(job[-1], data) for job, data in batch])
+    with transaction() as cursor:
+        record_renders(cursor, [(job[0], job_render_key(job, org_header)) for job, data in batch], template, sink)
+
+def render_invoices(jobs, workers=None, progress=None, template=DEFAULT_TEMPLATE, sink=None, write_batch_size=WRITE_BATCH_SIZE):
+    cursor = get_connection().cursor()
+    org_info = fetch_org_info(cursor)
+    org_header = get_org_header(cursor, template)
+    sink = sink or FileSystemSink()
+    
+    failures = []
+    batch = []
+    # The org row is shipped to each worker once; the worker decodes the logo and compiles the template a single time
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(org_info, template)) as executor:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+        results = executor.map(_render_job, jobs, chunksize=chunksize)
+        for done, (job, (invoice_number, pdf_path, data, error)) in enumerate(zip(jobs, results), start=1):
+            if error:
+                failures.append((invoice_number, error))
+            else:
+                batch.append((job, data))
+            # Written and synced a batch at a time rather than once per document
+            if len(batch) >= write_batch_size:
+                write_rendered(sink, batch, org_header, template)
+                batch = []
+            if progress:
+                progress(done, len(jobs))
+    if batch:
+        write_rendered(sink, batch, org_header, template)
+    return failures
+
+def generate_bulk_invoices(path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, render=True, progress=None, template=DEFAULT_TEMPLATE, sink=None):
+    invoices = read_invoices(path)
+    # Compiled up front so an unknown template fails before anything is saved
+    get_render_plan(template)
+    jobs = insert_invoices(invoices, chunk_size)
+    failures = render_invoices(jobs, workers, progress, template, sink) if render and jobs else []
+    return len(jobs), failures
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+from database import init_db
+from connection import get_connection
+from pdf_renderer import get_org_header, build_invoice_pdf
+from invoice_template import DEFAULT_TEMPLATE
+
+def sample_items(count):
+    # Intra-state lines at 18% GST: (product, quantity, price, hsn_code, gst_rate, cgst, sgst, igst)
+    lines = [(f"Product {index}", index % 5 + 1, 1000 + 100 * index) for index in range(count)]
+    return [(product, quantity, price, "8471", 1800, quantity * price * 9 // 100, quantity * price * 9 // 100, 0)
+            for product, quantity, price in lines]
+
+def time_path(org_header, items, invoices, fast, directory):
+    # Returns the elapsed time and whether every invoice was drawn on the canvas
+    total = sum(quantity * price + cgst + sgst + igst for product, quantity, price, hsn_code, rate, cgst, sgst, igst in items)
+    on_canvas = True
+    started = time.perf_counter()
+    for index in range(invoices):
+        pdf_path = os.path.join(directory, f"bench_{'fast' if fast else 'platypus'}_{index}.pdf")
+        on_canvas &= build_invoice_pdf(pdf_path, items, org_header, "Benchmark Customer", total, f"BENCH-{index:06d}",
+                                       "2024-01-01", "customer@example.com", "(+00) 000 000 0000", fast=fast)
+    return time.perf_counter() - started, on_canvas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare invoice rendering throughput of the canvas fast path and Platypus")
+    parser.add_argument("--invoices", type=int, default=500, help="Invoices rendered per path")
+    parser.add_argument("--items", type=int, nargs="+", default=[5, 15, 40], help="Line items per invoice (one run per value)")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Invoice layout to render")
+    args = parser.parse_args(argv)
+
+    init_db()
+    org_header = get_org_header(get_connection().cursor(), args.template)
+
+    print(f"{'items':>6} {'platypus/s':>12} {'fast/s':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for item_count in args.items:
+            items = sample_items(item_count)
+            # Warm up both paths so one-off layout and font loading are not counted
+            time_path(org_header, items, 1, False, directory)
+            time_path(org_header, items, 1, True, directory)
+            slow, _ = time_path(org_header, items, args.invoices, False, directory)
+            fast, on_canvas = time_path(org_header, items, args.invoices, True, directory)
+            # Invoices too long for one page fall back to Platypus, so both runs measured the same path
+            speedup = f"{slow / fast:>7.2f}x" if on_canvas else f"{'fallback':>8}"
+            print(f"{item_count:>6} {args.invoices / slow:>12.1f} {args.invoices / fast:>10.1f} {speedup}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
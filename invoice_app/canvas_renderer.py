@@ -0,0 +1,219 @@
+from functools import lru_cache
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Table
+
+FRAME_PADDING = 6
+CELL_STYLE_OPS = {"FONT", "FONTNAME", "FACE", "SIZE", "FONTSIZE", "LEADING", "TEXTCOLOR", "ALIGN", "ALIGNMENT", "VALIGN",
+                  "LEFTPADDING", "RIGHTPADDING", "TOPPADDING", "BOTTOMPADDING"}
+LINE_OPS = {"GRID", "BOX", "OUTLINE", "INNERGRID", "LINEABOVE", "LINEBELOW", "LINEBEFORE", "LINEAFTER"}
+# Row ranges that mean the same thing however many item rows there are: header, items, total row
+ROLE_ROW_RANGES = {(0, 0), (-1, -1), (0, -1), (1, -2), (1, -1), (0, -2)}
+
+def stack_flowables(flowables, top, avail_width, at_top=True, prev_space=0):
+    # Same placement rules as Frame._add (space before is dropped at the top of the frame and
+    # overlaps the previous space after), minus splitting: callers check the result still fits
+    placed = []
+    y = top
+    for flowable in flowables:
+        transfer = getattr(flowable, "_SPACETRANSFER", False)
+        space = 0
+        if not at_top:
+            space = prev_space if transfer else flowable.getSpaceBefore()
+            space = max(space - prev_space, 0)
+        width, height = flowable.wrap(avail_width, y - space)
+        bottom = y - height - space
+        placed.append((flowable, bottom, avail_width - width))
+
+        space_after = flowable.getSpaceAfter()
+        if not transfer:
+            prev_space = space_after
+        bottom -= space_after
+        if bottom != y:
+            at_top = False
+        y = bottom
+    return placed, y, at_top, prev_space
+
+def normalize_range(start, end, cols, rows):
+    (sc, sr), (ec, er) = start, end
+    return sc % cols, sr % rows, ec % cols, er % rows
+
+class CanvasTable:
+    # The template's table drawn straight onto the canvas. Cell styles are resolved once by letting
+    # reportlab style a three-row sample (header, item, total); item rows all share the middle one
+    def __init__(self, plan):
+        commands = plan.table_style.getCommands()
+        self.supported = all(self.is_supported(command) for command in commands)
+        sample = Table([plan.header_row] * 3, colWidths=plan.col_widths, style=plan.table_style)
+        self.role_styles = sample._cellStyles
+        self.col_widths = plan.col_widths
+        self.width = sum(plan.col_widths)
+        self.backgrounds = [command for command in commands if command[0] == "BACKGROUND"]
+        self.lines = [command for command in commands if command[0] in LINE_OPS]
+        self.spans = [command for command in commands if command[0] == "SPAN"]
+
+    @staticmethod
+    def is_supported(command):
+        op, (sc, sr), (ec, er) = command[:3]
+        if isinstance(sr, str) or isinstance(er, str):
+            return False
+        if op in ("ALIGN", "ALIGNMENT") and command[3] == "DECIMAL":
+            return False
+        if op in CELL_STYLE_OPS:
+            return (sr, er) in ROLE_ROW_RANGES
+        if op == "BACKGROUND":
+            return len(command) == 4 and not isinstance(command[3], (list, tuple))
+        if op in LINE_OPS:
+            return len(command) == 5
+        return op == "SPAN" and sr == er
+
+    def row_styles(self, row_count):
+        header, item, total = self.role_styles
+        return [header] + [item] * (row_count - 2) + [total]
+
+    def layout(self, rows):
+        styles = self.row_styles(len(rows))
+        heights = [max(len(str(value).split("\n")) * style.leading + style.topPadding + style.bottomPadding
+                       for value, style in zip(row, row_style))
+                   for row, row_style in zip(rows, styles)]
+        return styles, heights
+
+    def draw(self, canv, x, top, rows, styles, heights):
+        cols = len(self.col_widths)
+        row_count = len(rows)
+        xs = [x]
+        for width in self.col_widths:
+            xs.append(xs[-1] + width)
+        ys = [top]
+        for height in heights:
+            ys.append(ys[-1] - height)
+
+        span_end = {}
+        for command in self.spans:
+            sc, sr, ec, er = normalize_range(command[1], command[2], cols, row_count)
+            for col in range(sc, ec + 1):
+                span_end[(sr, col)] = ec if col == sc else None
+
+        canv.saveState()
+        for command in self.backgrounds:
+            sc, sr, ec, er = normalize_range(command[1], command[2], cols, row_count)
+            canv.setFillColor(command[3])
+            canv.rect(xs[sc], ys[er + 1], xs[ec + 1] - xs[sc], ys[sr] - ys[er + 1], stroke=0, fill=1)
+
+        # One text object for every cell, with font and colour only switched when the style changes
+        text = canv.beginText()
+        current = None
+        for row_index, (row, row_style) in enumerate(zip(rows, styles)):
+            for col, (value, style) in enumerate(zip(row, row_style)):
+                end = span_end.get((row_index, col), col)
+                if end is None:
+                    continue
+                if current is None or (style.fontname, style.fontsize, style.leading) != (current.fontname, current.fontsize, current.leading):
+                    text.setFont(style.fontname, style.fontsize, style.leading)
+                if current is None or style.color != current.color:
+                    text.setFillColor(style.color)
+                current = style
+                self.draw_cell(text, str(value), style, xs[col], ys[row_index + 1], xs[end + 1] - xs[col], heights[row_index])
+        canv.drawText(text)
+
+        canv.setLineCap(1)
+        canv.setLineJoin(1)
+        for op, start, end, weight, color in self.lines:
+            sc, sr, ec, er = normalize_range(start, end, cols, row_count)
+            above, below, before, after = {
+                "GRID": (range(sr, er + 1), [er], range(sc, ec + 1), [ec]),
+                "BOX": ([sr], [er], [sc], [ec]),
+                "OUTLINE": ([sr], [er], [sc], [ec]),
+                "INNERGRID": (range(sr + 1, er + 1), [], range(sc + 1, ec + 1), []),
+                "LINEABOVE": (range(sr, er + 1), [], [], []),
+                "LINEBELOW": ([], range(sr, er + 1), [], []),
+                "LINEBEFORE": ([], [], range(sc, ec + 1), []),
+                "LINEAFTER": ([], [], [], range(sc, ec + 1)),
+            }[op]
+            segments = [(xs[sc], ys[row_edge], xs[ec + 1], ys[row_edge]) for row_edge in [*above, *(row + 1 for row in below)]]
+            for col_edge in [*before, *(col + 1 for col in after)]:
+                # Vertical lines run unbroken except where a column span covers them
+                run_top = None
+                for row_index in range(sr, er + 2):
+                    hidden = row_index > er or (0 < col_edge < cols and span_end.get((row_index, col_edge), col_edge) is None)
+                    if hidden and run_top is not None:
+                        segments.append((xs[col_edge], ys[run_top], xs[col_edge], ys[row_index]))
+                        run_top = None
+                    elif not hidden and run_top is None:
+                        run_top = row_index
+            canv.setStrokeColor(color)
+            canv.setLineWidth(weight)
+            canv.lines(segments)
+        canv.restoreState()
+
+    @staticmethod
+    def draw_cell(text, value, style, x, y, width, height):
+        # Text placement follows Table._drawCell for plain string cells
+        lines = value.split("\n")
+        if style.valign == "TOP":
+            text_y = y + height - style.topPadding - style.fontsize
+        elif style.valign == "MIDDLE":
+            text_y = y + (style.bottomPadding + height - style.topPadding + len(lines) * style.leading) / 2.0 - style.fontsize
+        else:
+            text_y = y + style.bottomPadding + len(lines) * style.leading - style.fontsize
+
+        for line in lines:
+            if style.alignment in ("CENTRE", "CENTER"):
+                text_x = x + (width + style.leftPadding - style.rightPadding - stringWidth(line, style.fontname, style.fontsize)) * 0.5
+            elif style.alignment == "RIGHT":
+                text_x = x + width - style.rightPadding - stringWidth(line, style.fontname, style.fontsize)
+            else:
+                text_x = x + style.leftPadding
+            text.setTextOrigin(text_x, text_y)
+            text.textOut(line)
+            text_y -= style.leading
+
+@lru_cache(maxsize=None)
+def get_canvas_table(plan):
+    return CanvasTable(plan)
+
+def frame_geometry(plan):
+    page_width, page_height = plan.pagesize
+    margins = plan.margins
+    left = margins["leftMargin"] + FRAME_PADDING
+    top = page_height - margins["topMargin"] - FRAME_PADDING
+    bottom = margins["bottomMargin"] + FRAME_PADDING
+    width = page_width - margins["leftMargin"] - margins["rightMargin"] - 2 * FRAME_PADDING
+    return left, top, bottom, width
+
+def header_layout(org_header):
+    # The org block is laid out once per cached header; later invoices reuse the coordinates
+    layout = org_header.get("layout")
+    if layout is None:
+        left, top, bottom, width = frame_geometry(org_header["plan"])
+        layout = stack_flowables(org_header["flowables"], top, width)
+        org_header["layout"] = layout
+    return layout
+
+def render_single_page(output, org_header, detail_flowables, rows, draw_page):
+    # Returns None without writing anything when the invoice would not fit on one page or the
+    # template uses table styling this path does not handle; the caller then uses Platypus
+    plan = org_header["plan"]
+    table = get_canvas_table(plan)
+    if not table.supported:
+        return None
+
+    left, top, bottom, width = frame_geometry(plan)
+    header_placed, y, at_top, prev_space = header_layout(org_header)
+    styles, heights = table.layout(rows)
+    table_height = sum(heights)
+    # Checked before the details are wrapped so long invoices fall back without wasted layout work
+    if y - table_height < bottom or table.width > width:
+        return None
+    details_placed, table_top, at_top, prev_space = stack_flowables(detail_flowables, y, width, at_top, prev_space)
+    if table_top - table_height < bottom:
+        return None
+
+    canv = canvas.Canvas(output, pagesize=plan.pagesize)
+    draw_page(canv)
+    for flowable, flowable_y, slack in header_placed + details_placed:
+        flowable.drawOn(canv, left, flowable_y, _sW=slack)
+    table.draw(canv, left + (width - table.width) / 2.0, table_top, rows, styles, heights)
+    canv.showPage()
+    canv.save()
+    return output
@@ -0,0 +1,110 @@
+import argparse
+import sys
+from database import init_db, fetch_archive_backups
+from batch_operations import generate_bulk_invoices, DEFAULT_CHUNK_SIZE
+from archive_operations import ARCHIVE_BATCH_SIZE, ARCHIVE_PERIODS, start_archive, run_archive, pending_archives
+from archive_export import export_archive
+from invoice_template import DEFAULT_TEMPLATE
+from pdf_sinks import SINKS, PDF_DIR, create_sink
+from pdf_index import migrate_flat_pdfs
+from utils import STORAGE_DIR
+
+def run_generate(args):
+    def progress(done, total):
+        if done % 1000 == 0 or done == total:
+            print(f"Rendered {done}/{total} invoices", file=sys.stderr)
+    
+    try:
+        sink = create_sink(args.sink, args.output)
+        count, failures = generate_bulk_invoices(args.input, workers=args.workers, chunk_size=args.chunk_size,
+                                                 render=not args.no_pdf, progress=progress, template=args.template, sink=sink)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    
+    print(f"Saved {count} invoices")
+    for invoice_number, error in failures:
+        print(f"Failed to render {invoice_number}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+def run_archive_command(args):
+    def progress(moved, total):
+        print(f"Archived {moved}/{total} invoices", file=sys.stderr)
+    
+    archive_timestamps = pending_archives() if args.resume else [start_archive(args.period, args.export)]
+    if not archive_timestamps:
+        print("No interrupted archives to resume")
+        return 0
+    for archive_timestamp in archive_timestamps:
+        moved = run_archive(archive_timestamp, progress, args.batch_size)
+        print(f"Archive {archive_timestamp}: {moved} invoices moved")
+    return 0
+
+def run_export_command(args):
+    archive_timestamps = fetch_archive_backups() if args.all else args.timestamps
+    if not archive_timestamps:
+        print("Nothing to export; pass archive timestamps or --all", file=sys.stderr)
+        return 1
+    for archive_timestamp in archive_timestamps:
+        for path in export_archive(archive_timestamp):
+            print(f"Exported {path}")
+    return 0
+
+def run_purge_command(args):
+    removed = create_sink("filesystem", args.directory).purge()
+    print(f"Removed {removed} PDFs; they are re-rendered when next opened")
+    return 0
+
+def run_migrate_pdfs_command(args):
+    try:
+        assigned, moved, unmatched = migrate_flat_pdfs(args.source, args.directory or PDF_DIR)
+    except OSError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    print(f"Assigned {assigned} invoice PDF paths, moved {moved} PDFs into year/month folders")
+    if unmatched:
+        print(f"Left {unmatched} PDFs without a matching invoice in {args.source}", file=sys.stderr)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Invoice Generator command line tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    generate_parser = subparsers.add_parser("generate", help="Bulk-create invoices and PDFs from a CSV or JSONL file")
+    generate_parser.add_argument("input", help="CSV (one row per line item, grouped by invoice_ref) or JSONL (one invoice per line)")
+    generate_parser.add_argument("--workers", type=int, default=None, help="PDF rendering processes (default: CPU count)")
+    generate_parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Invoices inserted per transaction")
+    generate_parser.add_argument("--no-pdf", action="store_true", help="Only save invoices, skip PDF rendering")
+    generate_parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Invoice layout (a JSON file name in templates/)")
+    generate_parser.add_argument("--sink", choices=sorted(SINKS), default="filesystem", help="Where rendered PDFs are stored")
+    generate_parser.add_argument("--output", default=None, help="Sink location: directory, zip file, database file or bucket name")
+    generate_parser.set_defaults(handler=run_generate)
+    
+    archive_parser = subparsers.add_parser("archive", help="Move old invoices and their items into the archive tables")
+    archive_target = archive_parser.add_mutually_exclusive_group(required=True)
+    archive_target.add_argument("--period", choices=sorted(ARCHIVE_PERIODS), help="Archive invoices older than this period")
+    archive_target.add_argument("--resume", action="store_true", help="Finish archives that were interrupted")
+    archive_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Invoices moved per transaction")
+    archive_parser.add_argument("--export", action="store_true", help="Also snapshot the archive into columnar files for analytics")
+    archive_parser.set_defaults(handler=run_archive_command)
+    
+    export_parser = subparsers.add_parser("export", help="Snapshot archives into Parquet (or NumPy .npz) files for analytics")
+    export_parser.add_argument("timestamps", nargs="*", help="Archive timestamps to export")
+    export_parser.add_argument("--all", action="store_true", help="Export every archive")
+    export_parser.set_defaults(handler=run_export_command)
+    
+    purge_parser = subparsers.add_parser("purge-pdfs", help="Delete rendered invoice PDFs to free disk space")
+    purge_parser.add_argument("--directory", default=None, help="PDF directory (default: pdfs/ in the storage directory)")
+    purge_parser.set_defaults(handler=run_purge_command)
+    
+    migrate_parser = subparsers.add_parser("migrate-pdfs", help="Move PDFs from the old flat layout into year/month folders")
+    migrate_parser.add_argument("--source", default=STORAGE_DIR, help="Directory holding the flat invoice_<number>.pdf files")
+    migrate_parser.add_argument("--directory", default=None, help="Sharded PDF directory (default: pdfs/ in the storage directory)")
+    migrate_parser.set_defaults(handler=run_migrate_pdfs_command)
+    
+    args = parser.parse_args(argv)
+    init_db()
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
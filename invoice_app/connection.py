@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from utils import DB_PATH
+
+BUSY_TIMEOUT_MS = 5000
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}",
+)
+
+_local = threading.local()
+
+def open_connection(path=DB_PATH):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    # One long-lived connection per thread (and per process, so pool workers never inherit a parent's handle)
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = open_connection()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+def close_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+@contextmanager
+def transaction(immediate=False):
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    # Nested use becomes a savepoint so helpers can open a transaction without caring about their caller
+    if conn.in_transaction:
+        savepoint = f"sp_{id(cursor)}"
+        cursor.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute(f"ROLLBACK TO {savepoint}")
+            cursor.execute(f"RELEASE {savepoint}")
+            raise
+        cursor.execute(f"RELEASE {savepoint}")
+        return
+    
+    cursor.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield cursor
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
@@ -1,77 +1,336 @@
-import sqlite3
-import os
 from datetime import datetime
-from utils import STORAGE_DIR, DB_PATH
+from connection import get_connection, transaction
+from archive_db import attach_archive, migrate_legacy_archive
+from archive_export import fetch_archived_sales, fetch_archived_product_sales
+from logo_store import create_logo_store, migrate_inline_logos
+from invoice_numbers import create_invoice_sequences, enforce_unique_invoice_numbers
+import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from rollups import create_rollup_tables, fetch_rollup, fetch_product_rollup, fetch_monthly_increase
+from money import PAISE_PER_RUPEE
+
+HISTORY_PAGE_SIZE = 200
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS invoices (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        customer TEXT,
-                        total REAL,
-                        invoice_number TEXT,
-                        date_time TEXT,
-                        invoice_date TEXT,
-                        customer_email TEXT,
-                        customer_contact TEXT
-                    )''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS invoice_items (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        invoice_id INTEGER,
-                        product TEXT,
-                        quantity INTEGER,
-                        price REAL,
-                        FOREIGN KEY(invoice_id) REFERENCES invoices(id))''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS organization_info (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        org_name TEXT,
-                        gst_number TEXT,
-                        tin_number TEXT,
-                        org_address TEXT,
-                        org_email TEXT,
-                        org_contact TEXT,
-                        org_logo BLOB,
-                        date_time TEXT)''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS archived_invoices (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        customer TEXT,
-                        total REAL,
-                        invoice_number TEXT,
-                        invoice_date TEXT,
-                        customer_email TEXT,
-                        customer_contact TEXT,
-                        archive_timestamp TEXT)''')
-    cursor.execute('''CREATE TABLE IF NOT EXISTS archive_backups (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        archive_timestamp TEXT)''')
+    with transaction() as cursor:
+        cursor.execute('''CREATE TABLE IF NOT EXISTS invoices (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            customer TEXT,
+                            total REAL,
+                            invoice_number TEXT,
+                            date_time TEXT,
+                            invoice_date TEXT,
+                            customer_email TEXT,
+                            customer_contact TEXT,
+                            pdf_path TEXT,
+                            total_paise INTEGER,
+                            tax_paise INTEGER NOT NULL DEFAULT 0,
+                            place_of_supply TEXT
+                        )''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS invoice_items (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            invoice_id INTEGER,
+                            product TEXT,
+                            quantity INTEGER,
+                            price REAL,
+                            price_paise INTEGER,
+                            hsn_code TEXT,
+                            gst_rate INTEGER NOT NULL DEFAULT 0,
+                            cgst_paise INTEGER NOT NULL DEFAULT 0,
+                            sgst_paise INTEGER NOT NULL DEFAULT 0,
+                            igst_paise INTEGER NOT NULL DEFAULT 0,
+                            FOREIGN KEY(invoice_id) REFERENCES invoices(id))''')
+        cursor.execute('''CREATE TABLE IF NOT EXISTS organization_info (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            org_name TEXT,
+                            gst_number TEXT,
+                            tin_number TEXT,
+                            org_address TEXT,
+                            org_email TEXT,
+                            org_contact TEXT,
+                            org_logo BLOB,
+                            date_time TEXT,
+                            logo_hash TEXT)''')
+        
+        cursor.execute('''CREATE TABLE IF NOT EXISTS pdf_render_cache (
+                            invoice_id INTEGER PRIMARY KEY,
+                            render_key TEXT NOT NULL,
+                            rendered_at TEXT NOT NULL,
+                            template TEXT,
+                            sink TEXT,
+                            sink_target TEXT)''')
+        
+        # Template and sink the cached PDF was rendered with; NULL means the default template and PDF directory
+        ensure_columns(cursor, "pdf_render_cache", [("template", "TEXT"), ("sink", "TEXT"), ("sink_target", "TEXT")])
+        # pdf_path is the PDF's key under the sharded PDF directory, so opening an invoice needs no directory scan
+        ensure_columns(cursor, "invoices", [("pdf_path", "TEXT")])
+        # Amounts are kept in integer paise; total and price remain as rupee copies for older readers of this file
+        if ensure_columns(cursor, "invoices", [("total_paise", "INTEGER")]):
+            cursor.execute("UPDATE invoices SET total_paise = CAST(ROUND(total * 100) AS INTEGER)")
+        if ensure_columns(cursor, "invoice_items", [("price_paise", "INTEGER")]):
+            cursor.execute("UPDATE invoice_items SET price_paise = CAST(ROUND(price * 100) AS INTEGER)")
+        # GST per line (gst_rate in basis points) and per invoice; invoices saved before carry no tax
+        ensure_columns(cursor, "invoices", [("tax_paise", "INTEGER NOT NULL DEFAULT 0"), ("place_of_supply", "TEXT")])
+        ensure_columns(cursor, "invoice_items", [("hsn_code", "TEXT"), ("gst_rate", "INTEGER NOT NULL DEFAULT 0"),
+                                                 ("cgst_paise", "INTEGER NOT NULL DEFAULT 0"), ("sgst_paise", "INTEGER NOT NULL DEFAULT 0"),
+                                                 ("igst_paise", "INTEGER NOT NULL DEFAULT 0")])
+        create_logo_store(cursor)
+        if ensure_columns(cursor, "organization_info", [("logo_hash", "TEXT")]):
+            migrate_inline_logos(cursor)
+        create_invoice_sequences(cursor)
+        create_indexes(cursor)
+        enforce_unique_invoice_numbers(cursor)
+        create_search_index(cursor)
+        create_rollup_tables(cursor)
     
-    # Add default organization info if the table is empty
-    cursor.execute("SELECT COUNT(*) FROM organization_info")
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''INSERT INTO organization_info (org_name, gst_number, tin_number, org_address, org_email, org_contact, date_time)
-                          VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                      ("My Organization", "GST123456789", "TIN987654321", "123 Main St, City, Country \nMain Region \nZip Code - 00 00 00", "contact@my_organization.com", "(+00) 000 000 0000", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        # Add default organization info if the table is empty
+        cursor.execute("SELECT COUNT(*) FROM organization_info")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute('''INSERT INTO organization_info (org_name, gst_number, tin_number, org_address, org_email, org_contact, date_time)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                          ("My Organization", "GST123456789", "TIN987654321", "123 Main St, City, Country \nMain Region \nZip Code - 00 00 00", "contact@my_organization.com", "(+00) 000 000 0000", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
     
-    conn.commit()
-    conn.close()
+    migrate_legacy_archive()
+
+def ensure_columns(cursor, table, columns):
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    added = []
+    for name, definition in columns:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return added
 
-def fetch_non_archived_data():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def create_indexes(cursor):
+    # Substring filters on invoice_number and customer cannot use an index (invoice_number keeps its unique
+    # one), so only the date, which is filtered by range, is indexed
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_invoice_number")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_customer")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_invoice_date")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices(invoice_date)")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_total")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_total_paise ON invoices(total_paise)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items(invoice_id)")
+
+def create_search_index(cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'invoice_search'")
+    exists = cursor.fetchone() is not None
     
-    # Fetch invoices and invoice items
-    cursor.execute("SELECT id, date_time, total FROM invoices")
-    invoices = cursor.fetchall()
+    # rowid mirrors invoices.id; products holds the space-joined item names of the invoice
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS invoice_search USING fts5(customer, customer_email, products, prefix='2 3')")
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS invoice_search_ai AFTER INSERT ON invoices BEGIN
+                        INSERT INTO invoice_search (rowid, customer, customer_email, products) VALUES (new.id, new.customer, new.customer_email, '');
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS invoice_search_au AFTER UPDATE OF customer, customer_email ON invoices BEGIN
+                        UPDATE invoice_search SET customer = new.customer, customer_email = new.customer_email WHERE rowid = new.id;
+                      END''')
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS invoice_search_ad AFTER DELETE ON invoices BEGIN
+                        DELETE FROM invoice_search WHERE rowid = old.id;
+                      END''')
+    # Item names are indexed once per invoice by index_invoice_products; a per-item trigger rewrote the
+    # whole search row for every line, which made saving long invoices quadratic
+    cursor.execute("DROP TRIGGER IF EXISTS invoice_items_search_ai")
+    # Skipped when the parent invoice is already gone, so deleting invoices before their items stays cheap
+    cursor.execute('''CREATE TRIGGER IF NOT EXISTS invoice_items_search_ad AFTER DELETE ON invoice_items
+                      WHEN EXISTS (SELECT 1 FROM invoices WHERE id = old.invoice_id) BEGIN
+                        UPDATE invoice_search SET products = COALESCE((SELECT group_concat(product, ' ') FROM invoice_items WHERE invoice_id = old.invoice_id), '')
+                        WHERE rowid = old.invoice_id;
+                      END''')
     
-    cursor.execute("SELECT invoice_id, product, quantity, price FROM invoice_items")
-    items = cursor.fetchall()
+    if not exists:
+        cursor.execute('''INSERT INTO invoice_search (rowid, customer, customer_email, products)
+                          SELECT id, customer, customer_email,
+                                 COALESCE((SELECT group_concat(product, ' ') FROM invoice_items WHERE invoice_id = invoices.id), '')
+                          FROM invoices''')
+
+def index_invoice_products(cursor, invoices):
+    # invoices: iterable of (invoice_id, items) with each item's product name first
+    cursor.executemany("UPDATE invoice_search SET products = ? WHERE rowid = ?",
+                       [(" ".join(item[0] for item in items), invoice_id) for invoice_id, items in invoices])
+
+def build_match_query(text):
+    # Every term is quoted (so FTS operators in user input are literal) and prefix-matched
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in text.split())
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def build_invoice_filters(invoice_number="", customer="", total=None, invoice_date=""):
+    clauses = []
+    params = []
     
-    conn.close()
+    # Substring matches, as these filters have always worked: "000123" finds INV-2026-000123
+    if invoice_number:
+        clauses.append("i.invoice_number LIKE ? ESCAPE '\\'")
+        params.append("%" + escape_like(invoice_number) + "%")
+    if customer:
+        clauses.append("i.customer LIKE ? ESCAPE '\\'")
+        params.append("%" + escape_like(customer) + "%")
+    if total is not None:
+        # total is in paise
+        clauses.append("i.total_paise = ?")
+        params.append(total)
+    if invoice_date:
+        # A leading part of the date ("2024", "2024-03", "2024-03-15") as a range on the date index
+        clauses.append("i.invoice_date >= ? AND i.invoice_date < ?")
+        params.extend((invoice_date, invoice_date[:-1] + chr(ord(invoice_date[-1]) + 1)))
     
-    # Convert to pandas DataFrame
-    invoices_df = pd.DataFrame(invoices, columns=["id", "date_time", "total"])
-    items_df = pd.DataFrame(items, columns=["invoice_id", "product", "quantity", "price"])
+    return clauses, params
+
+def build_search_query(filters):
+    filters = dict(filters or {})
+    text = filters.pop("text", "").strip()
+    clauses, params = build_invoice_filters(**filters)
     
-    return invoices_df, items_df
+    if text:
+        clauses.insert(0, "invoice_search MATCH ?")
+        params.insert(0, build_match_query(text))
+        source = "invoice_search JOIN invoices i ON i.id = invoice_search.rowid"
+    else:
+        source = "invoices i"
+    if clauses:
+        source += " WHERE " + " AND ".join(clauses)
+    return source, params, bool(text)
+
+def count_invoices(filters=None):
+    source, params, _ = build_search_query(filters)
+    cursor = get_connection().cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {source}", params)
+    count = cursor.fetchone()[0]
+    return count
+
+def search_invoices(filters=None, after=None, limit=HISTORY_PAGE_SIZE, offset=0):
+    # Keyset pagination: "after" is the sort key of the last row already shown, returned
+    # alongside each page, so later pages never pay for an OFFSET scan
+    source, params, ranked = build_search_query(filters)
+    columns = "i.id, i.invoice_number, i.customer, printf('%.2f', i.total_paise / 100.0), i.invoice_date, i.customer_email, i.customer_contact"
+    
+    if ranked:
+        query = f"SELECT * FROM (SELECT {columns}, bm25(invoice_search, 10.0, 5.0, 1.0) AS score FROM {source})"
+        if after is not None:
+            query += " WHERE score > ? OR (score = ? AND id < ?)"
+            params.extend([after[0], after[0], after[1]])
+        query += " ORDER BY score, id DESC LIMIT ? OFFSET ?"
+    else:
+        query = f"SELECT {columns} FROM {source}"
+        if after is not None:
+            query += (" AND " if " WHERE " in query else " WHERE ") + "i.id < ?"
+            params.append(after[0])
+        query += " ORDER BY i.id DESC LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+    
+    cursor = get_connection().cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    
+    if not rows:
+        return [], after
+    if ranked:
+        return [row[:-1] for row in rows], (rows[-1][-1], rows[-1][0])
+    return rows, (rows[-1][0],)
+
+def count_archived_invoices(archive_timestamp):
+    cursor = attach_archive().cursor()
+    cursor.execute("SELECT COUNT(*) FROM archive.archived_invoices WHERE archive_timestamp = ?", (archive_timestamp,))
+    return cursor.fetchone()[0]
+
+def fetch_archived_invoices(archive_timestamp, after=None, limit=HISTORY_PAGE_SIZE, offset=0):
+    cursor = attach_archive().cursor()
+    cursor.execute('''SELECT id, invoice_number, customer, printf('%.2f', total_paise / 100.0), invoice_date FROM archive.archived_invoices
+                      WHERE archive_timestamp = ? AND id > ? ORDER BY id LIMIT ? OFFSET ?''',
+                   (archive_timestamp, after[0] if after else 0, limit, offset))
+    rows = cursor.fetchall()
+    return rows, ((rows[-1][0],) if rows else after)
+
+def fetch_archive_backups():
+    cursor = attach_archive().cursor()
+    cursor.execute("SELECT archive_timestamp FROM archive.archive_backups ORDER BY id DESC")
+    return [row[0] for row in cursor.fetchall()]
+
+class PagedSource:
+    # Row source for VirtualTreeview: rows are fetched a page at a time, each page continuing
+    # from the keyset of the one before it; only the most recently used pages stay in memory
+    def __init__(self, fetch_page, count_rows, page_size=HISTORY_PAGE_SIZE, max_pages=16):
+        self.fetch_page = fetch_page
+        self.count_rows = count_rows
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.page_keys = {0: None}
+        self.row_count = None
+
+    def count(self):
+        if self.row_count is None:
+            self.row_count = self.count_rows()
+        return self.row_count
+
+    def fetch(self, start, limit):
+        first_page = start // self.page_size
+        last_page = (start + limit - 1) // self.page_size
+        rows = []
+        for page_no in range(first_page, last_page + 1):
+            rows.extend(self.page(page_no))
+        skip = start - first_page * self.page_size
+        return rows[skip:skip + limit]
+
+    def page(self, page_no):
+        if page_no in self.pages:
+            self.pages.move_to_end(page_no)
+            return self.pages[page_no]
+        
+        # Jumps (e.g. dragging the scrollbar) start from the nearest page whose key is known
+        known_page = max(known for known in self.page_keys if known <= page_no)
+        rows, next_key = self.fetch_page(self.page_keys[known_page], (page_no - known_page) * self.page_size, self.page_size)
+        if rows:
+            self.page_keys[page_no + 1] = next_key
+        
+        self.pages[page_no] = rows
+        if len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return rows
+
+def invoice_search_source(filters=None):
+    return PagedSource(lambda after, offset, limit: search_invoices(filters, after, limit, offset),
+                       lambda: count_invoices(filters))
+
+def archived_invoice_source(archive_timestamp):
+    return PagedSource(lambda after, offset, limit: fetch_archived_invoices(archive_timestamp, after, limit, offset),
+                       lambda: count_archived_invoices(archive_timestamp))
+
+def fetch_sales_extremes():
+    # Both ends come straight off idx_invoices_total_paise instead of scanning every invoice
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT MAX(total_paise), MIN(total_paise) FROM invoices")
+    highest, lowest = cursor.fetchone()
+    return (highest or 0) / PAISE_PER_RUPEE, (lowest or 0) / PAISE_PER_RUPEE
+
+def paise_series(rows, index_name, name):
+    keys = [key for key, _ in rows]
+    values = np.array([value or 0 for _, value in rows], dtype=np.int64)
+    return pd.Series(values, index=pd.Index(keys, name=index_name), name=name)
+
+def fetch_sales_rollup_paise(period):
+    cursor = get_connection().cursor()
+    return paise_series(fetch_rollup(cursor, period), period, "total")
+
+# The fetch_* series below are in rupees for plotting; sums are done in int64 paise and converted last
+
+def fetch_sales_rollup(period):
+    return fetch_sales_rollup_paise(period) / PAISE_PER_RUPEE
+
+def fetch_sales_history(period):
+    # Live rollups plus any exported archive snapshots, for trends reaching past the archive cut-off
+    history = fetch_sales_rollup_paise(period).add(fetch_archived_sales(period), fill_value=0).astype(np.int64)
+    return history.sort_index() / PAISE_PER_RUPEE
+
+def fetch_product_sales():
+    # Products sold on archived invoices keep their totals, read from the exported snapshots
+    cursor = get_connection().cursor()
+    sales = paise_series(fetch_product_rollup(cursor), "product", "total_amount").add(fetch_archived_product_sales(), fill_value=0).astype(np.int64)
+    return sales.sort_index() / PAISE_PER_RUPEE
+
+def fetch_monthly_sales_increase():
+    cursor = get_connection().cursor()
+    return paise_series(fetch_monthly_increase(cursor), "month", "increase") / PAISE_PER_RUPEE
\ No newline at end of file
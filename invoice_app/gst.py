@@ -0,0 +1,116 @@
+import os
+import json
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+import numpy as np
+from utils import STORAGE_DIR
+from money import line_amounts
+
+# A rate table in the storage directory takes precedence over the bundled one
+GST_RATE_FILES = (
+    os.path.join(STORAGE_DIR, "gst_rates.json"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "gst_rates.json"),
+)
+HSN_DIGITS = 8
+# Rates are held as integer basis points of the taxable value (1800 = 18%), so tax is exact int64 arithmetic
+BASIS_POINTS = 10000
+
+def normalize_hsn(value):
+    # HSN (goods) and SAC (services) codes are 2 to 8 digits; "" means the line carries no GST
+    code = str(value or "").replace(" ", "").replace(".", "")
+    if code and not (code.isdigit() and 2 <= len(code) <= HSN_DIGITS):
+        raise ValueError(f"not an HSN/SAC code: {value!r}")
+    return code
+
+def state_code(value):
+    # Place of supply as a two-digit state code; a GSTIN starts with its state code, so either is accepted
+    value = str(value or "").strip().upper()
+    if not value:
+        return ""
+    if not (len(value) in (2, 15) and value[:2].isdigit()):
+        raise ValueError(f"not a state code or GSTIN: {value!r}")
+    return value[:2]
+
+def to_basis_points(percent):
+    try:
+        points = Decimal(str(percent)) * 100
+    except InvalidOperation:
+        raise ValueError(f"not a GST rate: {percent!r}")
+    if points != points.to_integral_value() or not 0 <= points <= BASIS_POINTS:
+        raise ValueError(f"not a GST rate: {percent!r}")
+    return int(points)
+
+def rate_percent(basis_points):
+    # 1800 -> "18", 25 -> "0.25"
+    return f"{Decimal(int(basis_points)).scaleb(-2).normalize():f}"
+
+class RateTable:
+    # HSN prefixes flattened into sorted, non-overlapping ranges of 8-digit codes, the longest listed
+    # prefix winning where ranges nest. A whole column of codes is then rated with one searchsorted
+    def __init__(self, rates):
+        entries = sorted(((normalize_hsn(prefix), to_basis_points(rate)) for prefix, rate in rates.items()),
+                         key=lambda entry: len(entry[0]))
+        ranges = [(int(prefix.ljust(HSN_DIGITS, "0")), 10 ** (HSN_DIGITS - len(prefix)), rate) for prefix, rate in entries if prefix]
+        self.bounds = np.unique(np.array([edge for low, span, _ in ranges for edge in (low, low + span)], dtype=np.int64))
+        # rates[i] applies to codes in [bounds[i], bounds[i + 1]); -1 marks codes no entry covers
+        self.rates = np.full(len(self.bounds), -1, dtype=np.int64)
+        for low, span, rate in ranges:
+            self.rates[np.searchsorted(self.bounds, low):np.searchsorted(self.bounds, low + span)] = rate
+
+    def lookup(self, codes):
+        # Normalized codes in, basis points out: 0 for lines without a code, -1 for unlisted codes
+        codes = np.asarray(codes, dtype=str)
+        if not codes.size:
+            return np.zeros(0, dtype=np.int64)
+        coded = np.char.str_len(codes) > 0
+        numbers = np.where(coded, np.char.ljust(codes, HSN_DIGITS, "0"), "0").astype(np.int64)
+        index = np.searchsorted(self.bounds, numbers, side="right") - 1
+        rates = np.where(index >= 0, self.rates[np.maximum(index, 0)] if len(self.rates) else -1, -1)
+        return np.where(coded, rates, 0)
+
+    def unknown(self, codes):
+        # Distinct codes without a rate, for one error message covering a whole import
+        distinct = np.unique(np.asarray(codes, dtype=str))
+        return distinct[self.lookup(distinct) < 0].tolist()
+
+@lru_cache(maxsize=None)
+def get_rate_table():
+    # Loaded once per process; batch workers and the GUI share the same compiled table
+    for path in GST_RATE_FILES:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                return RateTable(json.load(file)["rates"])
+    raise ValueError("No GST rate table found")
+
+def hsn_rate(code):
+    # Single-line check for interactive entry; raises for codes the rate table does not cover
+    code = normalize_hsn(code)
+    rate = int(get_rate_table().lookup([code])[0])
+    if rate < 0:
+        raise ValueError(f"no GST rate for HSN/SAC code {code}")
+    return code, rate
+
+def compute_gst(quantities, prices, hsn_codes, interstate):
+    # Per-line (rate, cgst, sgst, igst) arrays in paise for any number of lines from any number of
+    # invoices. Inter-state supplies pay IGST; intra-state tax is split into equal CGST and SGST halves.
+    # Each amount is rounded half-up to the paisa
+    if not len(hsn_codes):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    rates = get_rate_table().lookup(hsn_codes)
+    if (rates < 0).any():
+        raise ValueError(f"no GST rate for HSN/SAC code {np.asarray(hsn_codes)[rates < 0][0]}")
+    taxable = line_amounts(quantities, prices)
+    interstate = np.broadcast_to(np.asarray(interstate, dtype=bool), taxable.shape)
+    igst = np.where(interstate, (taxable * rates + BASIS_POINTS // 2) // BASIS_POINTS, 0)
+    cgst = np.where(interstate, 0, (taxable * rates + BASIS_POINTS) // (2 * BASIS_POINTS))
+    return rates, cgst, cgst, igst
+
+def fetch_supplier_state(cursor):
+    # The organization's state comes from its GSTIN; without one every supply is treated as intra-state
+    cursor.execute("SELECT gst_number FROM organization_info ORDER BY date_time DESC LIMIT 1")
+    row = cursor.fetchone()
+    try:
+        return state_code(row[0]) if row else ""
+    except ValueError:
+        return ""
@@ -1,13 +1,143 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from database import init_db
-from invoice_operations import save_invoice, reset_invoice_tab, add_product, edit_product, delete_product, update_total, open_invoice_pdf, filter_invoices, reset_filters, archive_data, refresh_backup_list, view_archived_data
+from database import init_db, invoice_search_source
+from invoice_operations import save_invoice, reset_invoice_tab, add_product, edit_product, delete_product, show_line_items, open_invoice_pdf, filter_invoices, reset_filters, archive_data, resume_archives, refresh_backup_list, view_archived_data, open_archived_pdf
 from organization_operations import save_org_info, load_org_info, upload_logo
-from analysis import plot_total_sales, plot_item_wise_sales, plot_highest_lowest, plot_monthly_increase
+from pdf_service import PdfRenderService
+from line_items import LineItems
+from analysis import plot_total_sales, plot_sales_trend, plot_item_wise_sales, plot_highest_lowest, plot_monthly_increase
 from utils import STORAGE_DIR, DB_PATH, FONT, HEADER_FONT, BUTTON_FONT, BACKGROUND_COLOR, BUTTON_COLOR, BUTTON_HOVER_COLOR, TEXT_COLOR, ENTRY_BG, TREEVIEW_BG, TREEVIEW_HEADER_BG, TREEVIEW_HEADER_FG
 from datetime import datetime, timedelta
 from tkcalendar import Calendar
 
+class ListSource:
+    def __init__(self, rows=None):
+        self.rows = rows if rows is not None else []
+
+    def count(self):
+        return len(self.rows)
+
+    def fetch(self, start, limit):
+        return self.rows[start:start + limit]
+
+class VirtualTreeview(tk.Frame):
+    # Treeview that only materializes the visible window of rows. The same item ids are
+    # recycled while scrolling and rows are pulled from a source exposing count() and fetch()
+    def __init__(self, parent, columns, height=15, source=None):
+        super().__init__(parent, bg=BACKGROUND_COLOR)
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=height, selectmode="browse")
+        for column in columns:
+            self.tree.heading(column, text=column)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+        
+        self.source = source if source is not None else ListSource()
+        self.items = []
+        self.offset = 0
+        self.row_count = 0
+        self.visible_rows = height
+        self.selected_index = None
+        
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self.move_selection(-self.visible_rows))
+        self.tree.bind("<Next>", lambda event: self.move_selection(self.visible_rows))
+        self.refresh()
+
+    def bind_row(self, sequence, handler):
+        self.tree.bind(sequence, handler)
+
+    def set_source(self, source):
+        self.source = source
+        self.offset = 0
+        self.selected_index = None
+        self.refresh()
+
+    def refresh(self):
+        self.row_count = self.source.count()
+        if self.selected_index is not None and self.selected_index >= self.row_count:
+            self.selected_index = None
+        self.offset = max(0, min(self.offset, self.row_count - self.visible_rows))
+        self.render()
+
+    def clear_selection(self):
+        self.selected_index = None
+        if self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+    def selected_row(self):
+        if self.selected_index is None:
+            return None
+        rows = self.source.fetch(self.selected_index, 1)
+        return rows[0] if rows else None
+
+    def scroll(self, delta):
+        offset = max(0, min(self.offset + delta, self.row_count - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+        return "break"
+
+    def move_selection(self, step):
+        if not self.row_count:
+            return "break"
+        index = 0 if self.selected_index is None else max(0, min(self.selected_index + step, self.row_count - 1))
+        self.selected_index = index
+        if index < self.offset:
+            self.offset = index
+        elif index >= self.offset + self.visible_rows:
+            self.offset = index - self.visible_rows + 1
+        self.render()
+        return "break"
+
+    def render(self):
+        rows = self.source.fetch(self.offset, self.visible_rows) if self.row_count else []
+        while len(self.items) < len(rows):
+            self.items.append(self.tree.insert("", "end", values=()))
+        while len(self.items) > len(rows):
+            self.tree.delete(self.items.pop())
+        for item, row in zip(self.items, rows):
+            self.tree.item(item, values=row)
+        
+        position = None if self.selected_index is None else self.selected_index - self.offset
+        if position is not None and 0 <= position < len(self.items):
+            self.tree.selection_set(self.items[position])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        
+        if self.row_count > self.visible_rows:
+            self.scrollbar.set(self.offset / self.row_count, (self.offset + self.visible_rows) / self.row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(value) * self.row_count) - self.offset)
+        elif unit == "pages":
+            self.scroll(int(value) * self.visible_rows)
+        else:
+            self.scroll(int(value))
+
+    def on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.items:
+            self.selected_index = self.offset + self.items.index(selection[0])
+
+    def on_configure(self, event):
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        first_row = self.tree.bbox(self.items[0]) if self.items else None
+        header_height = first_row[1] if first_row else row_height
+        visible_rows = max(1, (event.height - header_height) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self.refresh()
+
 def start_gui():
     root = tk.Tk()
     root.title("Invoice Generator")
@@ -15,6 +145,14 @@ def start_gui():
     root.configure(bg=BACKGROUND_COLOR)
     
     init_db()
+    render_service = PdfRenderService(root)
+    
+    def on_close():
+        # Let queued invoices finish rendering before the process exits
+        render_service.shutdown(wait=True)
+        root.destroy()
+    
+    root.protocol("WM_DELETE_WINDOW", on_close)
     
     tab_control = ttk.Notebook(root)
     tab_org_info = ttk.Frame(tab_control)
@@ -65,7 +203,7 @@ def start_gui():
     tk.Button(org_frame, text="Upload Logo", command=lambda: upload_logo(org_logo_entry), bg="#6eaaf0", fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=6, column=2, padx=5, pady=5)
 
     tk.Button(org_frame, text="Save Organization Info", command=lambda: save_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=7, column=1, padx=5, pady=10, sticky="e")
-    load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry)
+    load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry, org_logo_entry)
     
     tk.Label(org_frame, text="* Required Fields", bg=BACKGROUND_COLOR, font=FONT, fg="red").grid(row=9, column=0, padx=5, pady=5, sticky="w")
 
@@ -100,19 +238,24 @@ def start_gui():
     optional_frame.pack(fill="x", padx=20, pady=10)
     
     tk.Label(optional_frame, text="Customer Email:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(side="left", padx=5)
-    customer_email_entry = tk.Entry(optional_frame, width=90, font=FONT, bg=ENTRY_BG)
+    customer_email_entry = tk.Entry(optional_frame, width=60, font=FONT, bg=ENTRY_BG)
     customer_email_entry.pack(side="left", padx=5)
 
     tk.Label(optional_frame, text="Customer Contact:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(side="left", padx=5)
     customer_contact_entry = tk.Entry(optional_frame, width=30, font=FONT, bg=ENTRY_BG)
     customer_contact_entry.pack(side="left", padx=5)
 
+    tk.Label(optional_frame, text="Place of Supply:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(side="left", padx=5)
+    place_of_supply_entry = tk.Entry(optional_frame, width=17, font=FONT, bg=ENTRY_BG)
+    place_of_supply_entry.pack(side="left", padx=5)
+
     product_frame = tk.Frame(tab_invoice, bg=BACKGROUND_COLOR)
     product_frame.pack(fill="x", padx=20, pady=10)
     
     tk.Label(product_frame, text="Product", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=0, padx=5)
     tk.Label(product_frame, text="Quantity", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=1, padx=5)
     tk.Label(product_frame, text="Price", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=2, padx=5)
+    tk.Label(product_frame, text="HSN/SAC", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=3, padx=5)
     
     product_entry = tk.Entry(product_frame, width=50, font=FONT, bg=ENTRY_BG)
     product_entry.grid(row=1, column=0, padx=5)
@@ -120,29 +263,36 @@ def start_gui():
     quantity_entry.grid(row=1, column=1, padx=5)
     price_entry = tk.Entry(product_frame, width=10, font=FONT, bg=ENTRY_BG)
     price_entry.grid(row=1, column=2, padx=5)
+    hsn_entry = tk.Entry(product_frame, width=10, font=FONT, bg=ENTRY_BG)
+    hsn_entry.grid(row=1, column=3, padx=5)
     
-    tk.Button(product_frame, text="Add Product", command=lambda: add_product(product_entry, quantity_entry, price_entry, product_tree, total_label), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=1, column=3, padx=5)
+    tk.Button(product_frame, text="Add Product", command=lambda: add_product(product_entry, quantity_entry, price_entry, hsn_entry, line_items), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=1, column=4, padx=5)
     
-    product_tree = ttk.Treeview(tab_invoice, columns=("Product", "Quantity", "Price"), show="headings", height=10)
-    product_tree.heading("Product", text="Product")
-    product_tree.heading("Quantity", text="Quantity")
-    product_tree.heading("Price", text="Price")
-    product_tree.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
+    line_items = LineItems()
+    product_view = VirtualTreeview(tab_invoice, columns=("Product", "Quantity", "Price", "HSN/SAC"), height=10, source=line_items)
+    product_view.pack(fill=tk.BOTH, expand=True, padx=20, pady=10)
     
     button_frame = tk.Frame(tab_invoice, bg=BACKGROUND_COLOR)
     button_frame.pack(fill="x", padx=20, pady=10)
     
-    tk.Button(button_frame, text="Edit", command=lambda: edit_product(product_tree, product_entry, quantity_entry, price_entry, total_label), bg="#FFA500", fg="white", font=BUTTON_FONT, activebackground="#FF8C00").pack(side="left", padx=5)
-    tk.Button(button_frame, text="Delete", command=lambda: delete_product(product_tree, total_label), bg="#FF0000", fg="white", font=BUTTON_FONT, activebackground="#CC0000").pack(side="left", padx=5)
+    tk.Button(button_frame, text="Edit", command=lambda: edit_product(product_view, product_entry, quantity_entry, price_entry, hsn_entry), bg="#FFA500", fg="white", font=BUTTON_FONT, activebackground="#FF8C00").pack(side="left", padx=5)
+    tk.Button(button_frame, text="Delete", command=lambda: delete_product(product_view), bg="#FF0000", fg="white", font=BUTTON_FONT, activebackground="#CC0000").pack(side="left", padx=5)
     
-    total_label = tk.Label(button_frame, text="Total: ₹0.00", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR)
+    total_label = tk.Label(button_frame, text="Subtotal: ₹0.00", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR)
     total_label.pack(side="right", padx=10)
+    line_items.subscribe(lambda event, index: show_line_items(event, product_view, total_label))
     
     button_frame = tk.Frame(tab_invoice, bg=BACKGROUND_COLOR)
     button_frame.pack(pady=10)
 
-    tk.Button(button_frame, text="Reset", command=lambda: reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, product_entry, quantity_entry, price_entry, product_tree, total_label, invoice_date_var), bg="#6eaaf0", fg="white", font=BUTTON_FONT, activebackground="#CC0000").pack(side="left", padx=5)
-    tk.Button(button_frame, text="Save Invoice", command=lambda: save_invoice(customer_entry, customer_email_entry, customer_contact_entry, product_tree, invoice_date_var, total_label, product_entry, quantity_entry, price_entry), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(side="left", padx=5)
+    auto_open_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(button_frame, text="Open PDF after saving", variable=auto_open_var, bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(side="left", padx=5)
+
+    tk.Button(button_frame, text="Reset", command=lambda: reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, place_of_supply_entry, product_entry, quantity_entry, price_entry, hsn_entry, product_view, invoice_date_var), bg="#6eaaf0", fg="white", font=BUTTON_FONT, activebackground="#CC0000").pack(side="left", padx=5)
+    tk.Button(button_frame, text="Save Invoice", command=lambda: save_invoice(customer_entry, customer_email_entry, customer_contact_entry, place_of_supply_entry, product_view, invoice_date_var, product_entry, quantity_entry, price_entry, hsn_entry, render_service, auto_open_var, render_status_label), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(side="left", padx=5)
+
+    render_status_label = tk.Label(tab_invoice, text="", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR)
+    render_status_label.pack(pady=5)
     
     # Invoice History Tab
     history_frame = tk.Frame(tab_history, bg=BACKGROUND_COLOR)
@@ -155,7 +305,7 @@ def start_gui():
     invoice_number_filter_entry = tk.Entry(filter_frame, width=20, font=FONT, bg=ENTRY_BG)
     invoice_number_filter_entry.grid(row=0, column=1, padx=5, pady=5)
     
-    tk.Label(filter_frame, text="Customer:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=2, padx=5, pady=5)
+    tk.Label(filter_frame, text="Customer / Product:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).grid(row=0, column=2, padx=5, pady=5)
     customer_filter_entry = tk.Entry(filter_frame, width=20, font=FONT, bg=ENTRY_BG)
     customer_filter_entry.grid(row=0, column=3, padx=5, pady=5)
     
@@ -167,20 +317,13 @@ def start_gui():
     date_filter_entry = tk.Entry(filter_frame, width=15, font=FONT, bg=ENTRY_BG)
     date_filter_entry.grid(row=0, column=7, padx=5, pady=5)
     
-    tk.Button(filter_frame, text="Search", command=lambda: filter_invoices(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_tree), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=0, column=8, padx=5, pady=5)
-    tk.Button(filter_frame, text="Reset", command=lambda: reset_filters(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_tree), bg="#6eaaf0", fg="white", font=BUTTON_FONT, activebackground="#CC0000").grid(row=0, column=9, padx=5, pady=5)
+    tk.Button(filter_frame, text="Search", command=lambda: filter_invoices(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_view), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).grid(row=0, column=8, padx=5, pady=5)
+    tk.Button(filter_frame, text="Reset", command=lambda: reset_filters(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_view), bg="#6eaaf0", fg="white", font=BUTTON_FONT, activebackground="#CC0000").grid(row=0, column=9, padx=5, pady=5)
     
-    history_tree = ttk.Treeview(history_frame, columns=("ID", "Invoice Number", "Customer", "Total", "Invoice Date", "Customer Email", "Customer Contact"), show="headings", height=15)
-    history_tree.heading("ID", text="ID")
-    history_tree.heading("Invoice Number", text="Invoice Number")
-    history_tree.heading("Customer", text="Customer")
-    history_tree.heading("Total", text="Total")
-    history_tree.heading("Invoice Date", text="Invoice Date")
-    history_tree.heading("Customer Email", text="Customer Email")
-    history_tree.heading("Customer Contact", text="Customer Contact")
-    history_tree.pack(fill="both", expand=True, padx=10, pady=10)
+    history_view = VirtualTreeview(history_frame, columns=("ID", "Invoice Number", "Customer", "Total", "Invoice Date", "Customer Email", "Customer Contact"), height=15, source=invoice_search_source())
+    history_view.pack(fill="both", expand=True, padx=10, pady=10)
     
-    history_tree.bind("<Double-1>", lambda event: open_invoice_pdf(history_tree))
+    history_view.bind_row("<Double-1>", lambda event: open_invoice_pdf(history_view, render_service))
     
     # Operations Tab
     operations_frame = tk.Frame(tab_operations, bg=BACKGROUND_COLOR)
@@ -188,10 +331,18 @@ def start_gui():
     
     tk.Label(operations_frame, text="Archive Data:", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(pady=10)
     
-    tk.Button(operations_frame, text="Archive Last Year Data", command=lambda: archive_data("last_year", history_tree), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
-    tk.Button(operations_frame, text="Archive Last 6 Months Data", command=lambda: archive_data("last_6_months", history_tree), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
-    tk.Button(operations_frame, text="Archive Last 1 Month Data", command=lambda: archive_data("last_1_month", history_tree), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
-    tk.Button(operations_frame, text="Archive All Data", command=lambda: archive_data("all_data", history_tree), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    export_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(operations_frame, text="Export archived data for analytics (Parquet / NumPy)", variable=export_var, bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR).pack(anchor="w", padx=20, pady=5)
+    tk.Button(operations_frame, text="Archive Last Year Data", command=lambda: archive_data("last_year", history_view, root, archive_status_label, archive_progress, export_var.get()), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    tk.Button(operations_frame, text="Archive Last 6 Months Data", command=lambda: archive_data("last_6_months", history_view, root, archive_status_label, archive_progress, export_var.get()), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    tk.Button(operations_frame, text="Archive Last 1 Month Data", command=lambda: archive_data("last_1_month", history_view, root, archive_status_label, archive_progress, export_var.get()), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    tk.Button(operations_frame, text="Archive All Data", command=lambda: archive_data("all_data", history_view, root, archive_status_label, archive_progress, export_var.get()), bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    
+    archive_progress = ttk.Progressbar(operations_frame, orient="horizontal", mode="determinate")
+    archive_progress.pack(fill="x", padx=20, pady=10)
+    archive_status_label = tk.Label(operations_frame, text="", bg=BACKGROUND_COLOR, font=FONT, fg=TEXT_COLOR)
+    archive_status_label.pack(pady=5)
+    resume_archives(history_view, root, archive_status_label, archive_progress)
     
     # View Archived Tab
     view_archived_frame = tk.Frame(tab_view_archived, bg=BACKGROUND_COLOR)
@@ -204,21 +355,20 @@ def start_gui():
     
     backup_dropdown = ttk.Combobox(backup_dropdown_frame, font=FONT, state="readonly")
     backup_dropdown.pack(side="left", padx=5, fill="x", expand=True)
-    backup_dropdown.bind("<<ComboboxSelected>>", lambda event: view_archived_data(backup_dropdown.get(), archived_tree))
+    backup_dropdown.bind("<<ComboboxSelected>>", lambda event: view_archived_data(backup_dropdown.get(), archived_view))
     
-    archived_tree = ttk.Treeview(view_archived_frame, columns=("ID", "Invoice Number", "Customer", "Total", "Date"), show="headings", height=15)
-    archived_tree.heading("ID", text="ID")
-    archived_tree.heading("Invoice Number", text="Invoice Number")
-    archived_tree.heading("Customer", text="Customer")
-    archived_tree.heading("Total", text="Total")
-    archived_tree.heading("Date", text="Date")
-    archived_tree.pack(fill="both", expand=True, padx=10, pady=10)
+    archived_view = VirtualTreeview(view_archived_frame, columns=("ID", "Invoice Number", "Customer", "Total", "Date"), height=15)
+    archived_view.pack(fill="both", expand=True, padx=10, pady=10)
+    archived_view.bind_row("<Double-1>", lambda event: open_archived_pdf(archived_view, render_service))
+    # The archive database is only attached once the tab is actually opened
+    tab_control.bind("<<NotebookTabChanged>>", lambda event: refresh_backup_list(backup_dropdown, archived_view) if tab_control.select() == str(tab_view_archived) else None)
     
     # Analysis Tab
     analysis_frame = tk.Frame(tab_analysis, bg=BACKGROUND_COLOR)
     analysis_frame.pack(fill="both", padx=20, pady=20)
     
     tk.Button(analysis_frame, text="Total Sales (Month-wise and Year-wise)", command=plot_total_sales, bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
+    tk.Button(analysis_frame, text="Multi-year Sales Trend (incl. Archives)", command=plot_sales_trend, bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
     tk.Button(analysis_frame, text="Total Amount of Selling (Item-wise)", command=plot_item_wise_sales, bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
     tk.Button(analysis_frame, text="Highest and Lowest Amount", command=plot_highest_lowest, bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
     tk.Button(analysis_frame, text="Monthly Increase in Sales", command=plot_monthly_increase, bg=BUTTON_COLOR, fg="white", font=BUTTON_FONT, activebackground=BUTTON_HOVER_COLOR).pack(fill="x", padx=20, pady=5)
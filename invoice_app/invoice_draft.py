@@ -0,0 +1,88 @@
+from datetime import datetime
+import numpy as np
+from connection import transaction
+from rollups import add_to_rollups
+from database import index_invoice_products
+from invoice_numbers import reserve_invoice_numbers
+from pdf_sinks import invoice_pdf_path
+from money import PAISE_PER_RUPEE, segment_sums
+from gst import compute_gst, fetch_supplier_state, normalize_hsn, state_code
+
+class InvoiceDraft:
+    # An invoice that has not been saved yet. Prices and the total are integer paise; the total follows
+    # the items as they are added, so the header is written once with its final total. GST is worked
+    # out for a whole batch of drafts when they are saved
+    def __init__(self, customer, customer_email="", customer_contact="", invoice_date=None, items=(), place_of_supply=""):
+        self.customer = (customer or "").strip()
+        if not self.customer:
+            raise ValueError("customer name is required")
+        self.customer_email = (customer_email or "").strip()
+        self.customer_contact = (customer_contact or "").strip()
+        self.invoice_date = (invoice_date or "").strip() or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.place_of_supply = state_code(place_of_supply)
+        self.items = []
+        self.total = 0
+        self.taxes = []
+        self.tax = 0
+        for item in items:
+            self.add_item(*item)
+
+    def add_item(self, product, quantity, price, hsn_code=""):
+        self.items.append((product, quantity, price, normalize_hsn(hsn_code)))
+        self.total += quantity * price
+
+    def is_interstate(self, supplier_state):
+        return bool(supplier_state and self.place_of_supply and self.place_of_supply != supplier_state)
+
+    @property
+    def grand_total(self):
+        return self.total + self.tax
+
+    def lines(self):
+        # Item rows as stored and rendered: (product, quantity, price, hsn_code, gst_rate, cgst, sgst, igst)
+        return [item + taxes for item, taxes in zip(self.items, self.taxes)]
+
+def apply_gst(drafts, supplier_state):
+    # One vectorized pass over the lines of every draft, however many invoices the batch holds
+    lengths = [len(draft.items) for draft in drafts]
+    lines = [item for draft in drafts for item in draft.items]
+    _, quantities, prices, hsn_codes = zip(*lines) if lines else ((), (), (), ())
+    interstate = np.repeat(np.array([draft.is_interstate(supplier_state) for draft in drafts], dtype=bool), lengths)
+    rates, cgst, sgst, igst = compute_gst(quantities, prices, hsn_codes, interstate)
+    taxes = list(zip(rates.tolist(), cgst.tolist(), sgst.tolist(), igst.tolist()))
+    start = 0
+    for draft, length, tax in zip(drafts, lengths, segment_sums(cgst + sgst + igst, lengths).tolist()):
+        draft.taxes = taxes[start:start + length]
+        draft.tax = tax
+        start += length
+
+def save_drafts(cursor, drafts):
+    # Runs inside the caller's write transaction. Each header is one INSERT (its id is needed for the
+    # items); the items of every draft then go in through a single executemany
+    apply_gst(drafts, fetch_supplier_state(cursor))
+    date_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    saved = []
+    items = []
+    for invoice_number, draft in zip(reserve_invoice_numbers(cursor, len(drafts)), drafts):
+        pdf_path = invoice_pdf_path(invoice_number, draft.invoice_date)
+        cursor.execute('''INSERT INTO invoices
+                          (customer, total_paise, total, tax_paise, invoice_number, date_time, invoice_date,
+                           customer_email, customer_contact, place_of_supply, pdf_path)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                       (draft.customer, draft.grand_total, draft.grand_total / PAISE_PER_RUPEE, draft.tax, invoice_number, date_time,
+                        draft.invoice_date, draft.customer_email, draft.customer_contact, draft.place_of_supply, pdf_path))
+        invoice_id = cursor.lastrowid
+        items.extend((invoice_id, product, quantity, price, price / PAISE_PER_RUPEE, hsn_code, rate, cgst, sgst, igst)
+                     for product, quantity, price, hsn_code, rate, cgst, sgst, igst in draft.lines())
+        saved.append((invoice_id, invoice_number, pdf_path))
+    cursor.executemany('''INSERT INTO invoice_items
+                          (invoice_id, product, quantity, price_paise, price, hsn_code, gst_rate, cgst_paise, sgst_paise, igst_paise)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', items)
+    index_invoice_products(cursor, [(invoice_id, draft.items) for (invoice_id, _, _), draft in zip(saved, drafts)])
+    add_to_rollups(cursor, [(date_time, draft.grand_total, draft.items) for draft in drafts])
+    return saved
+
+def save_draft(draft):
+    # Returns (invoice_id, invoice_number, pdf_path)
+    with transaction(immediate=True) as cursor:
+        return save_drafts(cursor, [draft])[0]
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+INVOICE_NUMBER_PREFIX = "INV"
+# Restart numbering every calendar year (INV-2024-000001); set to False for one running sequence
+YEARLY_SEQUENCES = True
+SEQUENCE_DIGITS = 6
+
+def create_invoice_sequences(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS invoice_sequences (
+                        prefix TEXT PRIMARY KEY,
+                        last_value INTEGER NOT NULL)''')
+
+def enforce_unique_invoice_numbers(cursor):
+    # Older versions numbered invoices by the second, so same-second saves share a number. All but the
+    # first of each are renumbered with their id before the unique index goes on; their pdf_path is
+    # cleared so the next render stores them under the new name
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_invoices_invoice_number_unique'")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute('''UPDATE invoices SET invoice_number = invoice_number || '-' || id, pdf_path = NULL
+                      WHERE id NOT IN (SELECT MIN(id) FROM invoices GROUP BY invoice_number)''')
+    cursor.execute("CREATE UNIQUE INDEX idx_invoices_invoice_number_unique ON invoices(invoice_number)")
+
+def sequence_prefix(year=None):
+    if not YEARLY_SEQUENCES:
+        return INVOICE_NUMBER_PREFIX
+    return f"{INVOICE_NUMBER_PREFIX}-{year or datetime.now().year}"
+
+def reserve_invoice_numbers(cursor, count=1, prefix=None):
+    # Takes a block of consecutive numbers inside the caller's write transaction, so parallel writers
+    # never get overlapping blocks and a rolled-back insert hands its numbers back to the sequence
+    prefix = prefix or sequence_prefix()
+    cursor.execute('''INSERT INTO invoice_sequences (prefix, last_value) VALUES (?, ?)
+                      ON CONFLICT(prefix) DO UPDATE SET last_value = last_value + excluded.last_value''',
+                   (prefix, count))
+    cursor.execute("SELECT last_value FROM invoice_sequences WHERE prefix = ?", (prefix,))
+    last = cursor.fetchone()[0]
+    return [f"{prefix}-{value:0{SEQUENCE_DIGITS}d}" for value in range(last - count + 1, last + 1)]
@@ -1,142 +1,45 @@
-import sqlite3
 import os
 import tkinter as tk
-from datetime import datetime, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from io import BytesIO
-from reportlab.lib.utils import ImageReader
-from reportlab.platypus import Image
-from reportlab.lib.units import inch
+from datetime import datetime
 from tkinter import messagebox
-from utils import STORAGE_DIR, DB_PATH
-
-def save_invoice(customer_entry, customer_email_entry, customer_contact_entry, product_tree, invoice_date_var, total_label, product_entry, quantity_entry, price_entry):
-    customer = customer_entry.get()
-    if not customer:
-        messagebox.showerror("Error", "Customer name is required!")
+from database import invoice_search_source, archived_invoice_source, fetch_archive_backups
+from archive_operations import start_archive, run_archive, pending_archives
+from background import BackgroundTask
+from pdf_renderer import ensure_invoice_pdf
+from invoice_draft import InvoiceDraft, save_draft
+from archive_pdfs import extract_archived_pdf
+from money import to_paise, from_paise, format_rupees, line_amount
+from gst import hsn_rate
+
+archive_task = None
+
+def save_invoice(customer_entry, customer_email_entry, customer_contact_entry, place_of_supply_entry, product_view, invoice_date_var, product_entry, quantity_entry, price_entry, hsn_entry, render_service, auto_open_var, status_label):
+    try:
+        draft = InvoiceDraft(customer_entry.get(), customer_email_entry.get(), customer_contact_entry.get(),
+                             invoice_date_var.get(), product_view.source, place_of_supply_entry.get())
+    except ValueError as exc:
+        messagebox.showerror("Error", f"{str(exc).capitalize()}!")
         return
     
-    invoice_number = f"INV-{int(datetime.timestamp(datetime.now()))}"
-    invoice_date = invoice_date_var.get()
-    
-    customer_email = customer_email_entry.get().strip()
-    customer_contact = customer_contact_entry.get().strip()
-    
-    total = 0
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''INSERT INTO invoices 
-                      (customer, total, invoice_number, date_time, invoice_date, customer_email, customer_contact) 
-                      VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                   (customer, total, invoice_number, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
-                    invoice_date, customer_email, customer_contact))
-    
-    invoice_id = cursor.lastrowid
-    
-    for item in product_tree.get_children():
-        values = product_tree.item(item, "values")
-        quantity, price = int(values[1]), float(values[2])
-        item_total = quantity * price
-        total += item_total
-        cursor.execute("INSERT INTO invoice_items (invoice_id, product, quantity, price) VALUES (?, ?, ?, ?)", 
-                       (invoice_id, values[0], quantity, price))
+    invoice_id, invoice_number, _ = save_draft(draft)
     
-    cursor.execute("UPDATE invoices SET total = ? WHERE id = ?", (total, invoice_id))
-    conn.commit()
-    conn.close()
+    status_label.config(text=f"Rendering {invoice_number}...")
+    render_service.submit(invoice_id,
+                          on_done=lambda pdf_path: on_pdf_rendered(pdf_path, auto_open_var, status_label),
+                          on_error=lambda error: on_pdf_failed(invoice_number, error, status_label))
     
-    generate_pdf(invoice_id, customer, total, invoice_number, invoice_date, customer_email, customer_contact)
-    
-    messagebox.showinfo("Success", "Invoice Saved Successfully!")
-    reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, product_entry, quantity_entry, price_entry, product_tree, total_label, invoice_date_var)
+    reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, place_of_supply_entry, product_entry, quantity_entry, price_entry, hsn_entry, product_view, invoice_date_var)
 
-def generate_pdf(invoice_id, customer, total, invoice_number, date_time, customer_email="", customer_contact=""):
-    filename = f"invoice_{invoice_number}.pdf"
-    pdf_path = os.path.join(STORAGE_DIR, filename)
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT product, quantity, price FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
-    items = cursor.fetchall()
-    cursor.execute("SELECT org_name, gst_number, tin_number, org_address, org_email, org_contact, org_logo FROM organization_info ORDER BY date_time DESC LIMIT 1")
-    org_info = cursor.fetchone()
-    conn.close()
-    
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    styles = getSampleStyleSheet()
-    elements = []
+def on_pdf_rendered(pdf_path, auto_open_var, status_label):
+    status_label.config(text=f"Invoice saved as {os.path.basename(pdf_path)}")
+    if auto_open_var.get():
+        os.startfile(pdf_path)
 
-    def add_header(canvas, doc):
-        if org_info and org_info[6]:
-            logo_image = Image(BytesIO(org_info[6]), width=1.5*inch, height=0.75*inch)
-            logo_image.drawOn(canvas, doc.width + doc.leftMargin - 1.5*inch, doc.height + doc.topMargin - 0.25*inch)
+def on_pdf_failed(invoice_number, error, status_label):
+    status_label.config(text="")
+    messagebox.showerror("Error", f"Could not generate PDF for {invoice_number}: {error}")
 
-    tax_invoice_style = styles["Title"]
-    tax_invoice_style.fontSize = 14
-    elements.append(Paragraph("TAX/INVOICE", tax_invoice_style))
-    elements.append(Spacer(1, 12))
-    
-    if org_info:
-        org_name, gst_number, tin_number, org_address, org_email, org_contact, org_logo = org_info
-        org_name_paragraph = Paragraph(f"<b>{org_name}</b>", styles["Normal"])
-        elements.append(org_name_paragraph)
-        
-        if gst_number:
-            elements.append(Paragraph(f"GST Number: {gst_number}", styles["Normal"]))
-        if tin_number:
-            elements.append(Paragraph(f"TIN Number: {tin_number}", styles["Normal"]))
-        if org_address:
-            elements.append(Paragraph(f"Address: {org_address}", styles["Normal"]))
-        if org_email:
-            elements.append(Paragraph(f"Email: {org_email}", styles["Normal"]))
-        if org_contact:
-            elements.append(Paragraph(f"Contact: {org_contact}", styles["Normal"]))
-        
-        elements.append(Spacer(1, 12))
-    
-    invoice_style = styles["Heading2"]
-    invoice_style.fontSize = 10
-    invoice_text = f"Invoice Number: {invoice_number}<br/>Customer: {customer}<br/>"
-    
-    if customer_email:
-        invoice_text += f"Email: {customer_email}<br/>"
-    if customer_contact:
-        invoice_text += f"Contact: {customer_contact}<br/>"
-    
-    invoice_text += f"<align right>Date: {date_time}</align>"
-    elements.append(Paragraph(invoice_text, invoice_style))
-    elements.append(Spacer(1, 12))
-    
-    table_data = [["Product", "Quantity", "Price", "Total"]]
-    for product, quantity, price in items:
-        table_data.append([product, str(quantity), f"{price:.2f}", f"{quantity * price:.2f}"])
-    
-    table_data.append(["", "", "Total Amount:", f"{total:.2f}"])
-    
-    col_widths = [200, 80, 80, 80]
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('SPAN', (0, -1), (2, -1)),
-        ('ALIGN', (0, -1), (-1, -1), 'RIGHT'),
-    ]))
-    elements.append(table)
-    
-    doc.build(elements, onFirstPage=add_header, onLaterPages=add_header)
-    
-    messagebox.showinfo("PDF Generated", f"Invoice saved as {filename}")
-    os.startfile(pdf_path)
-
-def add_product(product_entry, quantity_entry, price_entry, product_tree, total_label):
+def add_product(product_entry, quantity_entry, price_entry, hsn_entry, line_items):
     product = product_entry.get()
     quantity = quantity_entry.get()
     price = price_entry.get()
@@ -154,193 +57,177 @@ def add_product(product_entry, quantity_entry, price_entry, product_tree, total_
         return
     
     try:
-        price = float(price)
+        price = to_paise(price)
         if price <= 0:
             raise ValueError("Price must be a positive number.")
     except ValueError:
         messagebox.showerror("Error", "Price must be a valid number.")
         return
     
-    product_tree.insert("", "end", values=(product, quantity, price))
+    try:
+        line_amount(quantity, price)
+    except ValueError as exc:
+        messagebox.showerror("Error", f"{str(exc).capitalize()}.")
+        return
+    
+    # Checked against the GST rate table now so an unknown code never reaches the save
+    try:
+        hsn_code, _ = hsn_rate(hsn_entry.get())
+    except ValueError as exc:
+        messagebox.showerror("Error", f"{str(exc).capitalize()}.")
+        return
+    
+    line_items.append(product, quantity, price, hsn_code)
     product_entry.delete(0, tk.END)
     quantity_entry.delete(0, tk.END)
     price_entry.delete(0, tk.END)
+    hsn_entry.delete(0, tk.END)
     product_entry.focus()
-    update_total(product_tree, total_label)
 
-def edit_product(product_tree, product_entry, quantity_entry, price_entry, total_label):
-    selected_item = product_tree.selection()
-    if not selected_item:
+def edit_product(product_view, product_entry, quantity_entry, price_entry, hsn_entry):
+    selected_index = product_view.selected_index
+    if selected_index is None:
         messagebox.showerror("Error", "Please select an item to edit.")
         return
-    item_values = product_tree.item(selected_item, "values")
+    # The index would otherwise point at the row that moves up into its place
+    product_view.clear_selection()
+    item_values = product_view.source.pop(selected_index)
     product_entry.delete(0, tk.END)
     product_entry.insert(0, item_values[0])
     quantity_entry.delete(0, tk.END)
     quantity_entry.insert(0, item_values[1])
     price_entry.delete(0, tk.END)
-    price_entry.insert(0, item_values[2])
-    product_tree.delete(selected_item)
-    update_total(product_tree, total_label)
+    price_entry.insert(0, from_paise(item_values[2]))
+    hsn_entry.delete(0, tk.END)
+    hsn_entry.insert(0, item_values[3])
 
-def delete_product(product_tree, total_label):
-    selected_item = product_tree.selection()
-    if not selected_item:
+def delete_product(product_view):
+    selected_index = product_view.selected_index
+    if selected_index is None:
         messagebox.showerror("Error", "Please select an item to delete.")
         return
-    product_tree.delete(selected_item)
-    update_total(product_tree, total_label)
-
-def update_total(product_tree, total_label):
-    total = 0
-    for item in product_tree.get_children():
-        values = product_tree.item(item, "values")
-        quantity, price = int(values[1]), float(values[2])
-        total += quantity * price
-    total_label.config(text=f"Total: ₹{total:.2f}")
-
-def open_invoice_pdf(history_tree):
-    selected_item = history_tree.selection()
-    if not selected_item:
+    product_view.clear_selection()
+    product_view.source.pop(selected_index)
+
+def show_line_items(event, product_view, total_label):
+    # Listener on the line items: the total is read, never recomputed, and only visible rows are redrawn
+    product_view.refresh()
+    if event == "add":
+        product_view.scroll(product_view.row_count)
+    total_label.config(text=f"Subtotal: {format_rupees(product_view.source.total)}")
+
+def open_invoice_pdf(history_view, render_service):
+    invoice_data = history_view.selected_row()
+    if not invoice_data:
         return
-    invoice_data = history_tree.item(selected_item, "values")
-    invoice_number = invoice_data[1]
-    pdf_path = os.path.join(STORAGE_DIR, f"invoice_{invoice_number}.pdf")
-    if os.path.exists(pdf_path):
-        os.startfile(pdf_path)
-    else:
-        messagebox.showerror("Error", "Invoice PDF not found!")
+    # The cached PDF is opened if still current; a missing or stale one is re-rendered off the UI thread
+    render_service.submit(invoice_data[0],
+                          on_done=os.startfile,
+                          on_error=lambda error: messagebox.showerror("Error", f"Could not open invoice {invoice_data[1]}: {error}"),
+                          render=ensure_invoice_pdf)
 
-def filter_invoices(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_tree):
-    invoice_number = invoice_number_filter_entry.get().strip()
-    customer = customer_filter_entry.get().strip()
+def filter_invoices(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_view):
     total = total_filter_entry.get().strip()
-    date = date_filter_entry.get().strip()
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    query = "SELECT id, invoice_number, customer, total, date_time FROM invoices WHERE 1=1"
-    
-    if invoice_number:
-        query += f" AND invoice_number LIKE '%{invoice_number}%'"
-    if customer:
-        query += f" AND customer LIKE '%{customer}%'"
     if total:
-        query += f" AND total = {float(total)}"
-    if date:
-        query += f" AND date_time LIKE '%{date}%'"
-    
-    cursor.execute(query)
-    invoices = cursor.fetchall()
-    conn.close()
-    
-    for row in history_tree.get_children():
-        history_tree.delete(row)
-    
-    for invoice in invoices:
-        history_tree.insert("", "end", values=invoice)
-
-def refresh_invoice_list(history_tree):
-    for row in history_tree.get_children():
-        history_tree.delete(row)
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, invoice_number, customer, total, invoice_date, customer_email, customer_contact FROM invoices")
-    invoices = cursor.fetchall()
-    conn.close()
-    
-    for invoice in invoices:
-        history_tree.insert("", "end", values=invoice)
-
-
-def reset_filters(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_tree):
+        try:
+            total = to_paise(total)
+        except ValueError:
+            messagebox.showerror("Error", "Total must be a valid number.")
+            return
+    
+    history_view.set_source(invoice_search_source({
+        "invoice_number": invoice_number_filter_entry.get().strip(),
+        "text": customer_filter_entry.get().strip(),
+        "total": total if total != "" else None,
+        "invoice_date": date_filter_entry.get().strip(),
+    }))
+
+def refresh_invoice_list(history_view):
+    history_view.set_source(invoice_search_source())
+
+def reset_filters(invoice_number_filter_entry, customer_filter_entry, total_filter_entry, date_filter_entry, history_view):
     invoice_number_filter_entry.delete(0, tk.END)
     customer_filter_entry.delete(0, tk.END)
     total_filter_entry.delete(0, tk.END)
     date_filter_entry.delete(0, tk.END)
-    refresh_invoice_list(history_tree)
+    refresh_invoice_list(history_view)
 
-def archive_data(period, history_tree):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    archive_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def archive_data(period, history_view, root, status_label, progress_bar, export=False):
+    if archive_task and archive_task.running():
+        messagebox.showerror("Error", "An archive is already in progress.")
+        return
     
-    if period == "last_year":
-        date_limit = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
-    elif period == "last_6_months":
-        date_limit = (datetime.now() - timedelta(days=180)).strftime("%Y-%m-%d")
-    elif period == "last_1_month":
-        date_limit = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-    elif period == "all_data":
-        date_limit = None
-    else:
+    try:
+        archive_timestamp = start_archive(period, export)
+    except ValueError:
         messagebox.showerror("Error", "Invalid period specified!")
         return
     
-    if date_limit:
-        cursor.execute(f'''INSERT INTO archived_invoices (customer, total, invoice_number, invoice_date, archive_timestamp)
-                          SELECT customer, total, invoice_number, invoice_date, ? FROM invoices
-                          WHERE invoice_date <= ?''',
-                      (archive_timestamp, date_limit))
-    else:
-        cursor.execute(f'''INSERT INTO archived_invoices (customer, total, invoice_number, invoice_date, archive_timestamp)
-                          SELECT customer, total, invoice_number, invoice_date, ? FROM invoices''',
-                      (archive_timestamp,))
+    run_archives_in_background([archive_timestamp], history_view, root, status_label, progress_bar,
+                               f"Data archived successfully for {period.replace('_', ' ')}!")
+
+def resume_archives(history_view, root, status_label, progress_bar):
+    archive_timestamps = pending_archives()
+    if archive_timestamps:
+        run_archives_in_background(archive_timestamps, history_view, root, status_label, progress_bar,
+                                   "Interrupted archive completed successfully!")
+
+def run_archives_in_background(archive_timestamps, history_view, root, status_label, progress_bar, message):
+    global archive_task
     
-    if date_limit:
-        cursor.execute("DELETE FROM invoices WHERE invoice_date <= ?", (date_limit,))
-    else:
-        cursor.execute("DELETE FROM invoices")
+    def work(progress):
+        for archive_timestamp in archive_timestamps:
+            run_archive(archive_timestamp, progress)
     
-    cursor.execute("INSERT INTO archive_backups (archive_timestamp) VALUES (?)", (archive_timestamp,))
+    def on_progress(moved, total):
+        progress_bar["maximum"] = max(total, 1)
+        progress_bar["value"] = moved
+        status_label.config(text=f"Archived {moved} of {total} invoices")
     
-    conn.commit()
-    conn.close()
+    def on_done(result):
+        messagebox.showinfo("Success", message)
+        refresh_invoice_list(history_view)
     
-    messagebox.showinfo("Success", f"Data archived successfully for {period.replace('_', ' ')}!")
-    refresh_invoice_list(history_tree)
-
-def refresh_backup_list(backup_dropdown):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT archive_timestamp FROM archive_backups ORDER BY id DESC")
-    backups = cursor.fetchall()
-    conn.close()
+    def on_error(error):
+        status_label.config(text="Archiving stopped; it will resume the next time the application starts.")
+        messagebox.showerror("Error", f"Archiving failed: {error}")
+        refresh_invoice_list(history_view)
     
-    backup_dropdown['values'] = [backup[0] for backup in backups]
-    
-    if backups:
-        backup_dropdown.set(backups[0][0])
-        view_archived_data(backups[0][0], tk.archived_tree)
+    status_label.config(text="Archiving...")
+    archive_task = BackgroundTask(root, work, on_progress, on_done, on_error)
 
-def view_archived_data(archive_timestamp, archived_tree):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT id, invoice_number, customer, total, invoice_date FROM archived_invoices WHERE archive_timestamp = ?", (archive_timestamp,))
-    archived_invoices = cursor.fetchall()
-    conn.close()
-    
-    for row in archived_tree.get_children():
-        archived_tree.delete(row)
+def refresh_backup_list(backup_dropdown, archived_view):
+    backups = fetch_archive_backups()
+    backup_dropdown['values'] = backups
     
-    for invoice in archived_invoices:
-        archived_tree.insert("", "end", values=invoice)
+    if backups and backup_dropdown.get() not in backups:
+        backup_dropdown.set(backups[0])
+        view_archived_data(backups[0], archived_view)
+
+def view_archived_data(archive_timestamp, archived_view):
+    archived_view.set_source(archived_invoice_source(archive_timestamp))
+
+def open_archived_pdf(archived_view, render_service):
+    invoice_data = archived_view.selected_row()
+    if not invoice_data:
+        return
+    # Only this invoice's PDF is pulled out of its archive bundle, off the UI thread
+    render_service.submit(invoice_data[0],
+                          on_done=os.startfile,
+                          on_error=lambda error: messagebox.showerror("Error", f"Could not open archived invoice {invoice_data[1]}: {error}"),
+                          render=extract_archived_pdf)
 
-def reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, product_entry, quantity_entry, price_entry, product_tree, total_label, invoice_date_var):
+def reset_invoice_tab(customer_entry, customer_email_entry, customer_contact_entry, place_of_supply_entry, product_entry, quantity_entry, price_entry, hsn_entry, product_view, invoice_date_var):
     customer_entry.delete(0, tk.END)
     customer_email_entry.delete(0, tk.END)
     customer_contact_entry.delete(0, tk.END)
+    place_of_supply_entry.delete(0, tk.END)
     
     product_entry.delete(0, tk.END)
     quantity_entry.delete(0, tk.END)
     price_entry.delete(0, tk.END)
+    hsn_entry.delete(0, tk.END)
     
-    for item in product_tree.get_children():
-        product_tree.delete(item)
+    product_view.source.clear()
     
-    total_label.config(text="Total: ₹0.00")
     invoice_date_var.set(datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
\ No newline at end of file
@@ -0,0 +1,116 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Table, TableStyle, Paragraph, Spacer
+from utils import STORAGE_DIR
+from money import from_paise
+from gst import rate_percent
+
+DEFAULT_TEMPLATE = "default"
+# Templates in the storage directory take precedence over the bundled ones
+TEMPLATE_DIRS = (
+    os.path.join(STORAGE_DIR, "templates"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"),
+)
+PAGE_SIZES = {"letter": letter, "A4": A4}
+
+def load_template(name):
+    for directory in TEMPLATE_DIRS:
+        path = os.path.join(directory, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                return json.load(file)
+    raise ValueError(f"Unknown invoice template: {name}")
+
+def compile_styles(definitions):
+    base = getSampleStyleSheet()
+    return {name: ParagraphStyle(f"{name}_{id(definitions)}", parent=base[options.get("parent", "Normal")],
+                                 **{key: value for key, value in options.items() if key != "parent"})
+            for name, options in definitions.items()}
+
+def compile_style_command(command):
+    # Colour names ("grey", "black") become reportlab colours; everything else is passed through
+    return tuple(tuple(arg) if isinstance(arg, list)
+                 else getattr(colors, arg) if isinstance(arg, str) and isinstance(getattr(colors, arg, None), colors.Color)
+                 else arg
+                 for arg in command)
+
+class TextBlock:
+    # A run of "label: value" lines; joined into one paragraph, or one paragraph per line when no join is given
+    def __init__(self, block, styles):
+        self.style = styles[block["style"]]
+        self.join = block.get("join")
+        self.space_after = block.get("space_after", 0)
+        self.lines = [(line["field"], line["format"].format, line.get("optional", False)) for line in block["lines"]]
+
+    def flowables(self, fields):
+        parts = [render(fields.get(field) or "") for field, render, optional in self.lines if fields.get(field) or not optional]
+        paragraphs = [self.join.join(parts)] if self.join is not None else parts
+        flowables = [Paragraph(text, self.style) for text in paragraphs]
+        if self.space_after:
+            flowables.append(Spacer(1, self.space_after))
+        return flowables
+
+class RenderPlan:
+    # Everything that does not depend on the invoice is built here once; rendering only formats cells
+    def __init__(self, template):
+        self.name = template["name"]
+        # Changes whenever the template file does, so cached PDFs rendered from an older layout go stale
+        self.version = hashlib.sha256(json.dumps(template, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.pagesize = PAGE_SIZES[template.get("page_size", "letter")]
+        margins = template.get("margins", {})
+        self.margins = {f"{side}Margin": margins.get(side, 72) for side in ("left", "right", "top", "bottom")}
+        self.styles = compile_styles(template["styles"])
+
+        title = template["title"]
+        self.title = [Paragraph(title["text"], self.styles[title["style"]]), Spacer(1, title.get("space_after", 0))]
+        self.organization = TextBlock(template["organization"], self.styles)
+        self.details = TextBlock(template["details"], self.styles)
+
+        table = template["table"]
+        self.header_row = [column["header"] for column in table["columns"]]
+        self.cell_formats = [column["value"].format for column in table["columns"]]
+        self.col_widths = [column["width"] for column in table["columns"]]
+        self.total_formats = [cell.format for cell in table["total_row"]]
+        self.table_style = TableStyle([compile_style_command(command) for command in table["style"]])
+
+    def header_flowables(self, org_fields):
+        return self.title + (self.organization.flowables(org_fields) if org_fields else [])
+
+    def detail_flowables(self, fields):
+        return self.details.flowables(fields)
+
+    def table_rows(self, items, total):
+        # Items are (product, quantity, price, hsn_code, gst_rate, cgst, sgst, igst) with amounts in paise,
+        # printed as exact rupee Decimals. amount is the line's taxable value and line_total includes its tax
+        cell_formats = self.cell_formats
+        rows = [self.header_row]
+        sums = {"taxable": 0, "cgst": 0, "sgst": 0, "igst": 0}
+        for product, quantity, price, hsn_code, rate, cgst, sgst, igst in items:
+            amount = quantity * price
+            tax = cgst + sgst + igst
+            rows.append([render(product=product, quantity=quantity, price=from_paise(price), amount=from_paise(amount),
+                                hsn=hsn_code or "", rate=rate_percent(rate), cgst=from_paise(cgst), sgst=from_paise(sgst),
+                                igst=from_paise(igst), tax=from_paise(tax), line_total=from_paise(amount + tax))
+                         for render in cell_formats])
+            sums["taxable"] += amount
+            sums["cgst"] += cgst
+            sums["sgst"] += sgst
+            sums["igst"] += igst
+        summary = {name: from_paise(value) for name, value in sums.items()}
+        summary["tax"] = from_paise(sums["cgst"] + sums["sgst"] + sums["igst"])
+        rows.append([render(total=from_paise(total), **summary) for render in self.total_formats])
+        return rows
+
+    def table(self, rows):
+        table = Table(rows, colWidths=self.col_widths)
+        table.setStyle(self.table_style)
+        return table
+
+@lru_cache(maxsize=None)
+def get_render_plan(name=DEFAULT_TEMPLATE):
+    return RenderPlan(load_template(name))
@@ -0,0 +1,76 @@
+from array import array
+from money import from_paise
+
+class LineItems:
+    # Line items of the invoice being keyed in, stored column-wise: names and HSN codes in lists, quantities
+    # and prices (paise) in typed arrays. The total is adjusted on every change and listeners are told what changed,
+    # so neither the total nor the view ever re-reads the rows. Also a row source for VirtualTreeview
+    __slots__ = ("products", "quantities", "prices", "hsn_codes", "total", "listeners")
+
+    def __init__(self, items=()):
+        self.products = []
+        self.quantities = array("q")
+        self.prices = array("q")
+        self.hsn_codes = []
+        self.total = 0
+        self.listeners = []
+        for item in items:
+            self.append(*item)
+
+    def subscribe(self, listener):
+        # listener(event, index) with event "add", "delete" or "clear"
+        self.listeners.append(listener)
+
+    def notify(self, event, index):
+        for listener in self.listeners:
+            listener(event, index)
+
+    def append(self, product, quantity, price, hsn_code=""):
+        # The typed columns go first and are undone together, so a value they reject (OverflowError,
+        # TypeError) leaves every column the same length
+        self.quantities.append(quantity)
+        try:
+            self.prices.append(price)
+        except (OverflowError, TypeError):
+            self.quantities.pop()
+            raise
+        self.products.append(product)
+        self.hsn_codes.append(hsn_code)
+        self.total += quantity * price
+        self.notify("add", len(self.products) - 1)
+
+    def pop(self, index):
+        item = self[index]
+        del self.products[index]
+        del self.quantities[index]
+        del self.prices[index]
+        del self.hsn_codes[index]
+        self.total -= item[1] * item[2]
+        self.notify("delete", index)
+        return item
+
+    def clear(self):
+        del self.products[:]
+        del self.quantities[:]
+        del self.prices[:]
+        del self.hsn_codes[:]
+        self.total = 0
+        self.notify("clear", None)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __getitem__(self, index):
+        return self.products[index], self.quantities[index], self.prices[index], self.hsn_codes[index]
+
+    def __iter__(self):
+        return zip(self.products, self.quantities, self.prices, self.hsn_codes)
+
+    def count(self):
+        return len(self.products)
+
+    def fetch(self, start, limit):
+        # Display rows, prices in rupees
+        end = start + limit
+        return list(zip(self.products[start:end], self.quantities[start:end], map(from_paise, self.prices[start:end]),
+                        self.hsn_codes[start:end]))
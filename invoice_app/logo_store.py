@@ -0,0 +1,101 @@
+import hashlib
+from io import BytesIO
+from functools import lru_cache
+from PIL import Image
+from reportlab.lib.units import inch
+from connection import get_connection, transaction
+
+try:
+    from svglib.svglib import svg2rlg
+    from reportlab.graphics import renderPM
+except ImportError:
+    svg2rlg = renderPM = None
+
+# Size the logo is drawn at on the invoice, and the resolution it is embedded at
+LOGO_WIDTH = 1.5 * inch
+LOGO_HEIGHT = 0.75 * inch
+LOGO_DPI = 200
+
+def create_logo_store(cursor):
+    # Logos are stored once per distinct content and referenced from organization_info by hash
+    cursor.execute('''CREATE TABLE IF NOT EXISTS logo_assets (
+                        hash TEXT PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        size INTEGER NOT NULL)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS logo_renditions (
+                        hash TEXT NOT NULL,
+                        dpi INTEGER NOT NULL,
+                        data BLOB NOT NULL,
+                        PRIMARY KEY (hash, dpi))''')
+
+def logo_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def store_logo(cursor, data):
+    digest = logo_hash(data)
+    cursor.execute("INSERT OR IGNORE INTO logo_assets (hash, data, size) VALUES (?, ?, ?)", (digest, data, len(data)))
+    return digest
+
+def migrate_inline_logos(cursor):
+    # Older rows carry their own copy of the logo; move each distinct image into the store
+    cursor.execute("SELECT id, org_logo FROM organization_info WHERE org_logo IS NOT NULL")
+    for org_id, data in cursor.fetchall():
+        cursor.execute("UPDATE organization_info SET logo_hash = ?, org_logo = NULL WHERE id = ?", (store_logo(cursor, data), org_id))
+
+@lru_cache(maxsize=8)
+def read_logo(digest):
+    # Content-addressed, so a cached entry can never go stale
+    if not digest:
+        return None
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT data FROM logo_assets WHERE hash = ?", (digest,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def is_svg(data):
+    head = data[:1024].lstrip().lower()
+    return head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head)
+
+def rasterize_svg(data, dpi):
+    if svg2rlg is None:
+        raise ValueError("SVG logos need the svglib package")
+    drawing = svg2rlg(BytesIO(data))
+    if drawing is None:
+        raise ValueError("The SVG logo could not be read")
+    return Image.open(BytesIO(renderPM.drawToString(drawing, fmt="PNG", dpi=dpi)))
+
+def prepare_logo(data, dpi=LOGO_DPI):
+    # Downsample to the pixels the logo box actually needs at the target DPI; opaque images are
+    # re-encoded as JPEG, transparent ones as optimized PNG so the mask still works
+    try:
+        image = rasterize_svg(data, dpi) if is_svg(data) else Image.open(BytesIO(data))
+        image.load()
+    except (OSError, SyntaxError) as exc:
+        raise ValueError(f"Unsupported logo image: {exc}") from exc
+    
+    image.thumbnail((round(LOGO_WIDTH / inch * dpi), round(LOGO_HEIGHT / inch * dpi)), Image.LANCZOS)
+    output = BytesIO()
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image.convert("RGBA").save(output, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+@lru_cache(maxsize=8)
+def read_logo_rendition(digest, dpi=LOGO_DPI):
+    # Prepared once per logo and DPI, then shared by every render in every process
+    if not digest:
+        return None
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT data FROM logo_renditions WHERE hash = ? AND dpi = ?", (digest, dpi))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    
+    data = read_logo(digest)
+    if data is None:
+        return None
+    rendition = prepare_logo(data, dpi)
+    with transaction() as cursor:
+        cursor.execute("INSERT OR IGNORE INTO logo_renditions (hash, dpi, data) VALUES (?, ?, ?)", (digest, dpi, rendition))
+    return rendition
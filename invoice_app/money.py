@@ -0,0 +1,62 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import numpy as np
+
+# Money is stored and summed as integer paise; rupees only appear when parsing input and printing
+PAISE_PER_RUPEE = 100
+CURRENCY_SYMBOL = "₹"
+# Largest price or line amount accepted (₹1 lakh crore). Line amounts are multiplied by a GST rate in basis
+# points (up to 10000) and summed over an invoice in int64, which this keeps clear of overflow
+MAX_PAISE = 10 ** 14
+
+def to_paise(value):
+    # Accepts user or file input ("12.5", 12.5, Decimal) and rounds half-up to the nearest paisa
+    try:
+        rupees = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f"not an amount: {value!r}")
+    if not rupees.is_finite():
+        raise ValueError(f"not an amount: {value!r}")
+    paise = int((rupees * PAISE_PER_RUPEE).to_integral_value(rounding=ROUND_HALF_UP))
+    if abs(paise) > MAX_PAISE:
+        raise ValueError(f"amount too large: {value!r}")
+    return paise
+
+def line_amount(quantity, price):
+    # quantity * price in paise, held to the same bound as a single amount
+    amount = quantity * price
+    if abs(amount) > MAX_PAISE:
+        raise ValueError("line amount too large")
+    return amount
+
+def from_paise(paise):
+    # Exact rupee amount for printing; formats like "{:.2f}" work as they do on floats
+    return Decimal(int(paise)).scaleb(-2)
+
+def format_rupees(paise):
+    return f"{CURRENCY_SYMBOL}{from_paise(paise):,.2f}"
+
+def paise_array(rupees):
+    # Legacy float columns (REAL in SQLite, float64 in old exports) to integer paise
+    return np.rint(np.nan_to_num(np.asarray(rupees, dtype=np.float64)) * PAISE_PER_RUPEE).astype(np.int64)
+
+def line_amounts(quantities, prices):
+    return np.asarray(quantities, dtype=np.int64) * np.asarray(prices, dtype=np.int64)
+
+def grouped_sum(labels, *values):
+    # Exact int64 sums of each value column per distinct label; returns (keys, sums, ...)
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind="stable")
+    keys, starts = np.unique(labels[order], return_index=True)
+    if not len(keys):
+        return (keys, *(np.zeros(0, dtype=np.int64) for _ in values))
+    return (keys, *(np.add.reduceat(np.asarray(column, dtype=np.int64)[order], starts) for column in values))
+
+def segment_sums(values, lengths):
+    # Sums of consecutive runs of the given lengths, e.g. line amounts -> invoice totals; empty runs sum to 0
+    lengths = np.asarray(lengths, dtype=np.int64)
+    sums = np.zeros(len(lengths), dtype=np.int64)
+    non_empty = lengths > 0
+    if non_empty.any():
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        sums[non_empty] = np.add.reduceat(np.asarray(values, dtype=np.int64), starts[non_empty])
+    return sums
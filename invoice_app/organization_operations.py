@@ -1,10 +1,13 @@
-import sqlite3
 import tkinter as tk
 from tkinter import messagebox
-from utils import DB_PATH
+from connection import get_connection, transaction
 import os
 from datetime import datetime, timedelta
 from tkinter import filedialog
+from pdf_renderer import invalidate_org_header_cache
+from logo_store import store_logo, prepare_logo, read_logo_rendition
+
+org_logo_hash = None
 
 def save_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry):
     org_name = org_name_entry.get()
@@ -17,26 +20,25 @@ def save_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_em
     org_address = org_address_text.get("1.0", tk.END).strip()
     org_email = org_email_entry.get().strip()
     org_contact = org_contact_entry.get().strip()
-    org_logo = org_logo_blob if 'org_logo_blob' in globals() else None
     date_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''INSERT INTO organization_info 
-                      (org_name, gst_number, tin_number, org_address, org_email, org_contact, org_logo, date_time) 
-                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                   (org_name, gst_number, tin_number, org_address, org_email, org_contact, org_logo, date_time))
-    conn.commit()
-    conn.close()
+    with transaction() as cursor:
+        # A newly uploaded logo is stored once by content; otherwise the current one is kept
+        logo = store_logo(cursor, org_logo_blob) if 'org_logo_blob' in globals() else org_logo_hash
+        cursor.execute('''INSERT INTO organization_info 
+                          (org_name, gst_number, tin_number, org_address, org_email, org_contact, logo_hash, date_time) 
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                       (org_name, gst_number, tin_number, org_address, org_email, org_contact, logo, date_time))
+    invalidate_org_header_cache()
+    read_logo_rendition(logo)
     messagebox.showinfo("Success", "Organization Info Saved Successfully!")
     load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry)
 
-def load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT org_name, gst_number, tin_number, org_address, org_email, org_contact, org_logo FROM organization_info ORDER BY date_time DESC LIMIT 1")
+def load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_email_entry, org_contact_entry, org_logo_entry=None):
+    global org_logo_hash
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT org_name, gst_number, tin_number, org_address, org_email, org_contact, logo_hash FROM organization_info ORDER BY date_time DESC LIMIT 1")
     org_info = cursor.fetchone()
-    conn.close()
     
     if org_info:
         org_info = list(org_info) + [None] * (7 - len(org_info))
@@ -58,11 +60,12 @@ def load_org_info(org_name_entry, gst_entry, tin_entry, org_address_text, org_em
         if org_info[5]:
             org_contact_entry.insert(0, org_info[5])
         
-        if org_info[6]:
-            global org_logo_blob
-            org_logo = org_info[6]
-            org_logo.delete(0, tk.END)
-            org_logo.insert(0, "Logo Uploaded")
+        org_logo_hash = org_info[6]
+        if org_logo_hash and org_logo_entry is not None:
+            org_logo_entry.config(state="normal")
+            org_logo_entry.delete(0, tk.END)
+            org_logo_entry.insert(0, "Logo Uploaded")
+            org_logo_entry.config(state="readonly")
 
 def upload_logo(org_logo_entry):
     file_path = filedialog.askopenfilename(
@@ -75,8 +78,14 @@ def upload_logo(org_logo_entry):
             messagebox.showerror("Error", "File size must be less than 2 MB!")
             return
         with open(file_path, "rb") as file:
-            global org_logo_blob
-            org_logo_blob = file.read()
+            data = file.read()
+        try:
+            prepare_logo(data)
+        except ValueError as exc:
+            messagebox.showerror("Error", str(exc))
+            return
+        global org_logo_blob
+        org_logo_blob = data
         
         org_logo_entry.config(state="normal")
         org_logo_entry.delete(0, tk.END)
@@ -0,0 +1,46 @@
+import os
+import glob
+import shutil
+from utils import STORAGE_DIR
+from connection import get_connection, transaction
+from pdf_sinks import PDF_DIR, invoice_pdf_name, invoice_pdf_path
+
+def fetch_pdf_path(cursor, invoice_id):
+    cursor.execute("SELECT pdf_path FROM invoices WHERE id = ?", (invoice_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def assign_pdf_paths(cursor):
+    # Invoices saved before the pdf_path column existed get the shard their invoice date maps to
+    cursor.execute("SELECT id, invoice_number, invoice_date FROM invoices WHERE pdf_path IS NULL")
+    assigned = [(invoice_pdf_path(invoice_number, invoice_date), invoice_id) for invoice_id, invoice_number, invoice_date in cursor.fetchall()]
+    cursor.executemany("UPDATE invoices SET pdf_path = ? WHERE id = ?", assigned)
+    return len(assigned)
+
+def migrate_flat_pdfs(source=STORAGE_DIR, directory=PDF_DIR):
+    # Moves invoice_<number>.pdf files from the old flat layout into their shard. Safe to re-run:
+    # a file that is moved twice or not at all is simply re-rendered the next time it is opened
+    with transaction(immediate=True) as cursor:
+        assigned = assign_pdf_paths(cursor)
+
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT invoice_number, pdf_path FROM invoices")
+    paths = {invoice_pdf_name(invoice_number): pdf_path for invoice_number, pdf_path in cursor.fetchall()}
+
+    moved = 0
+    unmatched = 0
+    for path in glob.glob(os.path.join(source, invoice_pdf_name("*"))):
+        pdf_path = paths.get(os.path.basename(path))
+        if pdf_path is None:
+            # No live invoice with that number (archived or deleted); left where it is
+            unmatched += 1
+            continue
+        target = os.path.join(directory, *pdf_path.split("/"))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            # Already rendered into the shard; the flat copy is the older one
+            os.remove(path)
+        else:
+            shutil.move(path, target)
+        moved += 1
+    return assigned, moved, unmatched
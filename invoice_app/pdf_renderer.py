@@ -0,0 +1,173 @@
+import hashlib
+from datetime import datetime
+from reportlab.platypus import SimpleDocTemplate
+from io import BytesIO
+from reportlab.lib.utils import ImageReader
+from reportlab.lib.units import inch
+from connection import get_connection, transaction
+from logo_store import read_logo_rendition, LOGO_WIDTH, LOGO_HEIGHT
+from invoice_template import DEFAULT_TEMPLATE, get_render_plan
+from canvas_renderer import render_single_page
+from pdf_sinks import FileSystemSink, invoice_pdf_path, create_sink, local_path
+from pdf_index import fetch_pdf_path
+
+_org_header_cache = {}
+
+def fetch_invoice_items(cursor, invoice_id):
+    cursor.execute('''SELECT product, quantity, price_paise, hsn_code, gst_rate, cgst_paise, sgst_paise, igst_paise
+                      FROM invoice_items WHERE invoice_id = ?''', (invoice_id,))
+    return cursor.fetchall()
+
+def fetch_latest_org_id(cursor):
+    cursor.execute("SELECT id FROM organization_info ORDER BY date_time DESC LIMIT 1")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def fetch_org_info(cursor, org_id=None):
+    if org_id is None:
+        org_id = fetch_latest_org_id(cursor)
+    cursor.execute("SELECT id, org_name, gst_number, tin_number, org_address, org_email, org_contact, logo_hash FROM organization_info WHERE id = ?", (org_id,))
+    return cursor.fetchone()
+
+def fetch_invoice(cursor, invoice_id):
+    cursor.execute('''SELECT customer, total_paise, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply
+                      FROM invoices WHERE id = ?''', (invoice_id,))
+    return cursor.fetchone()
+
+ORG_FIELDS = ("org_name", "gst_number", "tin_number", "org_address", "org_email", "org_contact")
+
+def build_org_header(org_info, plan):
+    logo = None
+    org_fields = None
+    
+    if org_info:
+        org_fields = dict(zip(ORG_FIELDS, org_info[1:7]))
+        try:
+            org_logo = read_logo_rendition(org_info[7])
+        except ValueError:
+            # An unreadable logo is left off rather than failing every invoice
+            org_logo = None
+        if org_logo:
+            logo = ImageReader(BytesIO(org_logo))
+    
+    return {"id": org_info[0] if org_info else None, "plan": plan, "flowables": plan.header_flowables(org_fields), "logo": logo}
+
+def get_org_header(cursor, template=DEFAULT_TEMPLATE):
+    # Only the id is read per render; the logo decode and header flowables are reused until the org changes
+    org_id = fetch_latest_org_id(cursor)
+    header = _org_header_cache.get((org_id, template))
+    if header is None:
+        header = build_org_header(fetch_org_info(cursor, org_id), get_render_plan(template))
+        _org_header_cache[(org_id, template)] = header
+    return header
+
+def invalidate_org_header_cache():
+    _org_header_cache.clear()
+
+def draw_logo(canvas, logo, plan):
+    page_width, page_height = plan.pagesize
+    canvas.drawImage(logo, page_width - plan.margins["rightMargin"] - LOGO_WIDTH, page_height - plan.margins["bottomMargin"] - 0.25*inch,
+                     width=LOGO_WIDTH, height=LOGO_HEIGHT, mask="auto")
+
+def build_invoice_pdf(output, items, org_header, customer, total, invoice_number, date_time, customer_email="", customer_contact="",
+                      place_of_supply="", fast=True):
+    # Returns True if the invoice was drawn by the canvas fast path, False if it went through Platypus
+    plan = org_header["plan"]
+    logo = org_header["logo"]
+
+    def add_header(canvas, doc=None):
+        if logo:
+            draw_logo(canvas, logo, plan)
+
+    details = plan.detail_flowables({
+        "invoice_number": invoice_number,
+        "customer": customer,
+        "customer_email": customer_email,
+        "customer_contact": customer_contact,
+        "place_of_supply": place_of_supply,
+        "date": date_time,
+    })
+    rows = plan.table_rows(items, total)
+    
+    # Invoices that fit on one page are drawn straight onto the canvas; longer ones go through Platypus
+    if fast and render_single_page(output, org_header, details, rows, add_header):
+        return True
+    
+    doc = SimpleDocTemplate(output, pagesize=plan.pagesize, **plan.margins)
+    elements = list(org_header["flowables"]) + details
+    elements.append(plan.table(rows))
+    doc.build(elements, onFirstPage=add_header, onLaterPages=add_header)
+    return False
+
+def render_invoice_pdf(items, org_header, customer, total, invoice_number, date_time, customer_email="", customer_contact="", place_of_supply=""):
+    buffer = BytesIO()
+    build_invoice_pdf(buffer, items, org_header, customer, total, invoice_number, date_time, customer_email, customer_contact, place_of_supply)
+    return buffer.getvalue()
+
+def load_invoice(cursor, invoice_id, template=DEFAULT_TEMPLATE):
+    invoice = fetch_invoice(cursor, invoice_id)
+    if invoice is None:
+        raise LookupError(f"Invoice {invoice_id} does not exist")
+    return invoice, fetch_invoice_items(cursor, invoice_id), get_org_header(cursor, template)
+
+def invoice_render_key(invoice, items, org_header):
+    # Covers everything printed on the PDF: the invoice row, its items, the org row and the template
+    payload = repr((invoice, items, org_header["id"], org_header["plan"].version))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def resolve_pdf_path(cursor, invoice_id, invoice):
+    # The path recorded on the invoice wins; rows not yet migrated fall back to their date's shard
+    return fetch_pdf_path(cursor, invoice_id) or invoice_pdf_path(invoice[2], invoice[3])
+
+def render_loaded_invoice(invoice, items, org_header, pdf_path):
+    customer, total, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply = invoice
+    data = render_invoice_pdf(items, org_header, customer, total, invoice_number, invoice_date, customer_email, customer_contact, place_of_supply)
+    return pdf_path, data
+
+def render_invoice(invoice_id, template=DEFAULT_TEMPLATE):
+    # Rendered entirely in memory; returns the sink key and PDF bytes for whichever sink stores or serves them
+    cursor = get_connection().cursor()
+    invoice, items, org_header = load_invoice(cursor, invoice_id, template)
+    return render_loaded_invoice(invoice, items, org_header, resolve_pdf_path(cursor, invoice_id, invoice))
+
+def fetch_render_record(cursor, invoice_id):
+    # (render_key, template, sink kind, sink target) of the stored PDF, or None if it was never rendered
+    cursor.execute("SELECT render_key, template, sink, sink_target FROM pdf_render_cache WHERE invoice_id = ?", (invoice_id,))
+    return cursor.fetchone()
+
+def record_renders(cursor, renders, template, sink):
+    # renders: (invoice_id, render_key) pairs; the template and sink are kept so a re-render matches the original
+    rendered_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cursor.executemany('''INSERT INTO pdf_render_cache (invoice_id, render_key, rendered_at, template, sink, sink_target)
+                          VALUES (?, ?, ?, ?, ?, ?)
+                          ON CONFLICT(invoice_id) DO UPDATE SET render_key = excluded.render_key, rendered_at = excluded.rendered_at,
+                                                                template = excluded.template, sink = excluded.sink,
+                                                                sink_target = excluded.sink_target''',
+                       [(invoice_id, render_key, rendered_at, template, sink.kind, sink.target) for invoice_id, render_key in renders])
+
+def store_invoice_pdf(invoice_id, invoice, items, org_header, sink, pdf_path, template=DEFAULT_TEMPLATE):
+    location = sink.write_batch([render_loaded_invoice(invoice, items, org_header, pdf_path)])[0]
+    with transaction() as cursor:
+        cursor.execute("UPDATE invoices SET pdf_path = ? WHERE id = ? AND pdf_path IS NULL", (pdf_path, invoice_id))
+        record_renders(cursor, [(invoice_id, invoice_render_key(invoice, items, org_header))], template, sink)
+    return location
+
+def generate_pdf(invoice_id, template=DEFAULT_TEMPLATE, sink=None):
+    sink = sink or FileSystemSink()
+    cursor = get_connection().cursor()
+    invoice, items, org_header = load_invoice(cursor, invoice_id, template)
+    return store_invoice_pdf(invoice_id, invoice, items, org_header, sink, resolve_pdf_path(cursor, invoice_id, invoice), template)
+
+def ensure_invoice_pdf(invoice_id, template=None, sink=None):
+    # Serves the stored PDF while nothing printed on it has changed; a stale or deleted one is rendered
+    # again with the template and into the sink it was first made with. Returns a path the OS can open
+    cursor = get_connection().cursor()
+    record = fetch_render_record(cursor, invoice_id)
+    render_key, stored_template, sink_kind, sink_target = record or (None, None, None, None)
+    template = template or stored_template or DEFAULT_TEMPLATE
+    sink = sink or (create_sink(sink_kind, sink_target) if sink_kind else FileSystemSink())
+    invoice, items, org_header = load_invoice(cursor, invoice_id, template)
+    pdf_path = resolve_pdf_path(cursor, invoice_id, invoice)
+    if render_key != invoice_render_key(invoice, items, org_header) or not sink.exists(pdf_path):
+        store_invoice_pdf(invoice_id, invoice, items, org_header, sink, pdf_path, template)
+    return local_path(sink, pdf_path)
@@ -0,0 +1,53 @@
+import queue
+import threading
+from pdf_renderer import generate_pdf
+from connection import close_connection
+
+POLL_INTERVAL_MS = 100
+
+class PdfRenderService:
+    def __init__(self, root):
+        self.root = root
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.worker = threading.Thread(target=self._run, name="pdf-render", daemon=True)
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def submit(self, invoice_id, on_done=None, on_error=None, render=generate_pdf):
+        self.jobs.put((invoice_id, on_done, on_error, render))
+
+    def pending(self):
+        return self.jobs.unfinished_tasks
+
+    def shutdown(self, wait=True):
+        self.jobs.put(None)
+        if wait:
+            self.worker.join()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                close_connection()
+                self.jobs.task_done()
+                return
+            invoice_id, on_done, on_error, render = job
+            try:
+                pdf_path = render(invoice_id)
+            except Exception as exc:
+                self.results.put((on_error, exc))
+            else:
+                self.results.put((on_done, pdf_path))
+            self.jobs.task_done()
+
+    def _poll(self):
+        # Tk is not thread-safe, so callbacks are only ever invoked from the event loop
+        while True:
+            try:
+                callback, value = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if callback:
+                callback(value)
+        self.root.after(POLL_INTERVAL_MS, self._poll)
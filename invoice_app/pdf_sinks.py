@@ -0,0 +1,321 @@
+import os
+import re
+import glob
+import json
+import hashlib
+import zipfile
+import tempfile
+from contextlib import closing
+from utils import STORAGE_DIR
+from connection import open_connection
+
+PDF_DIR = os.path.join(STORAGE_DIR, "pdfs")
+PDF_STORE_PATH = os.path.join(STORAGE_DIR, "invoice_pdfs.db")
+ZIP_BUNDLE_PATH = os.path.join(STORAGE_DIR, "invoices.zip")
+OBJECT_STORE_DIR = os.path.join(STORAGE_DIR, "object_store")
+DEFAULT_BUCKET = "invoices"
+# Where PDFs kept outside the file system are copied to when they need opening
+OPEN_DIR = os.path.join(tempfile.gettempdir(), "invoice_pdfs")
+
+def invoice_pdf_name(invoice_number):
+    return f"invoice_{invoice_number}.pdf"
+
+def pdf_shard(invoice_date):
+    # Year/month of the invoice date keeps every directory to one month of invoices
+    match = re.match(r"(\d{4})-(\d{2})", invoice_date or "")
+    return f"{match.group(1)}/{match.group(2)}" if match else "undated"
+
+def invoice_pdf_path(invoice_number, invoice_date):
+    # Sink-relative key, always "/"-separated; this is what invoices.pdf_path records
+    return f"{pdf_shard(invoice_date)}/{invoice_pdf_name(invoice_number)}"
+
+def sync_file(file):
+    # Through the handle that wrote it: Windows can only flush a file opened for writing
+    file.flush()
+    os.fsync(file.fileno())
+
+def sync_paths(paths):
+    # Flushes files already written and closed, so a batch is written in full before any of it is
+    # synced and the disk sees one burst of flushes per batch. Opened for writing, which Windows needs
+    for path in paths:
+        with open(path, "r+b") as file:
+            os.fsync(file.fileno())
+
+def sync_directories(directories):
+    # Makes new names and renames durable, once per directory per batch. POSIX only: Windows cannot
+    # open a directory for flushing and commits directory entries with the file system metadata
+    if os.name == "nt":
+        return
+    for directory in set(directories):
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class FileSystemSink:
+    # PDFs as individual files under year/month shard directories of the PDF directory. Every sink
+    # exposes kind and target so create_sink(kind, target) can reopen it for a later render
+    kind = "filesystem"
+
+    def __init__(self, directory=PDF_DIR):
+        self.directory = directory
+        self.target = directory
+
+    def write_batch(self, documents):
+        staged = []
+        shards = set()
+        for name, data in documents:
+            path = self.location(name)
+            if os.path.dirname(path) not in shards:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shards.add(os.path.dirname(path))
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            staged.append(path)
+        sync_paths(path + ".tmp" for path in staged)
+        for path in staged:
+            os.replace(path + ".tmp", path)
+        sync_directories(shards)
+        return staged
+
+    def location(self, name):
+        return os.path.join(self.directory, *name.split("/"))
+
+    def purge(self):
+        # Safe at any time: opening an invoice re-renders a PDF that is no longer on disk
+        paths = glob.glob(os.path.join(self.directory, "**", invoice_pdf_name("*")), recursive=True)
+        for path in paths:
+            os.remove(path)
+        return len(paths)
+
+    def exists(self, name):
+        return os.path.exists(self.location(name))
+
+    def read(self, name):
+        path = self.location(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as file:
+            return file.read()
+
+    def read_batch(self, names):
+        # Yields (name, data) for each stored name; every sink skips names it does not hold
+        for name in names:
+            data = self.read(name)
+            if data is not None:
+                yield name, data
+
+class ZipSink:
+    # PDFs appended to a single zip bundle; stored uncompressed since PDF streams are already deflated
+    kind = "zip"
+
+    def __init__(self, path=ZIP_BUNDLE_PATH):
+        self.path = path
+        self.target = path
+
+    def write_batch(self, documents):
+        if os.path.exists(self.path):
+            with zipfile.ZipFile(self.path) as bundle:
+                replaced = {name for name, data in documents} & set(bundle.namelist())
+            if replaced:
+                self.rewrite(documents, replaced)
+                return [self.location(name) for name, data in documents]
+        created = not os.path.exists(self.path)
+        with open(self.path, "w+b" if created else "r+b") as file:
+            with zipfile.ZipFile(file, "a", compression=zipfile.ZIP_STORED) as bundle:
+                for name, data in documents:
+                    bundle.writestr(name, data)
+            sync_file(file)
+        if created:
+            sync_directories([os.path.dirname(os.path.abspath(self.path))])
+        return [self.location(name) for name, data in documents]
+
+    def rewrite(self, documents, replaced):
+        # Zip members cannot be replaced in place, so a batch re-rendering stored PDFs copies the rest of
+        # the bundle into a new one beside it and swaps it in
+        with open(self.path + ".tmp", "wb") as file:
+            with zipfile.ZipFile(self.path) as old, zipfile.ZipFile(file, "w", compression=zipfile.ZIP_STORED) as bundle:
+                for info in old.infolist():
+                    if info.filename not in replaced:
+                        bundle.writestr(info, old.read(info))
+                for name, data in documents:
+                    bundle.writestr(name, data)
+            sync_file(file)
+        os.replace(self.path + ".tmp", self.path)
+        sync_directories([os.path.dirname(os.path.abspath(self.path))])
+
+    def location(self, name):
+        return f"{self.path}:{name}"
+
+    def exists(self, name):
+        if not os.path.exists(self.path):
+            return False
+        with zipfile.ZipFile(self.path) as bundle:
+            return name in bundle.NameToInfo
+
+    def read(self, name):
+        if not os.path.exists(self.path):
+            return None
+        with zipfile.ZipFile(self.path) as bundle:
+            try:
+                return bundle.read(name)
+            except KeyError:
+                return None
+
+    def read_batch(self, names):
+        # The central directory is parsed once for the whole batch
+        if not os.path.exists(self.path):
+            return
+        with zipfile.ZipFile(self.path) as bundle:
+            for name in names:
+                if name in bundle.NameToInfo:
+                    yield name, bundle.read(name)
+
+class SqliteSink:
+    # PDFs as BLOBs in their own database file, one transaction per batch
+    kind = "sqlite"
+
+    def __init__(self, path=PDF_STORE_PATH):
+        self.path = path
+        self.target = path
+
+    def write_batch(self, documents):
+        with closing(open_connection(self.path)) as conn:
+            with conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS invoice_pdfs (
+                                    name TEXT PRIMARY KEY,
+                                    data BLOB NOT NULL)''')
+                conn.executemany("INSERT OR REPLACE INTO invoice_pdfs (name, data) VALUES (?, ?)", documents)
+        return [self.location(name) for name, data in documents]
+
+    def location(self, name):
+        return f"sqlite:{self.path}:{name}"
+
+    def exists(self, name):
+        if not os.path.exists(self.path):
+            return False
+        with closing(open_connection(self.path)) as conn:
+            return conn.execute("SELECT 1 FROM invoice_pdfs WHERE name = ?", (name,)).fetchone() is not None
+
+    def read(self, name):
+        if not os.path.exists(self.path):
+            return None
+        with closing(open_connection(self.path)) as conn:
+            row = conn.execute("SELECT data FROM invoice_pdfs WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def read_batch(self, names):
+        if not os.path.exists(self.path):
+            return
+        with closing(open_connection(self.path)) as conn:
+            for name in names:
+                row = conn.execute("SELECT data FROM invoice_pdfs WHERE name = ?", (name,)).fetchone()
+                if row:
+                    yield name, row[0]
+
+class LocalObjectStore:
+    # Minimal stand-in for an S3 client: put_object/get_object on a directory per bucket, with the
+    # ETag and content type kept in a sidecar file
+    def __init__(self, directory=OBJECT_STORE_DIR):
+        self.directory = directory
+
+    def object_path(self, bucket, key):
+        return os.path.join(self.directory, bucket, *key.split("/"))
+
+    def put_object(self, Bucket, Key, Body, ContentType="application/octet-stream"):
+        path = self.object_path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        etag = hashlib.md5(Body).hexdigest()
+        with open(path, "wb") as file:
+            file.write(Body)
+        with open(path + ".meta.json", "w", encoding="utf-8") as file:
+            json.dump({"ETag": etag, "ContentType": ContentType, "ContentLength": len(Body)}, file)
+        return {"ETag": f'"{etag}"'}
+
+    def sync_objects(self, Bucket, Keys):
+        # Not part of the S3 API: puts are only written, and a batch of them is made durable at once here
+        paths = [self.object_path(Bucket, key) for key in Keys]
+        sync_paths(path + suffix for path in paths for suffix in ("", ".meta.json"))
+        sync_directories(os.path.dirname(path) for path in paths)
+
+    def head_object(self, Bucket, Key):
+        with open(self.object_path(Bucket, Key) + ".meta.json", encoding="utf-8") as file:
+            return json.load(file)
+
+    def get_object(self, Bucket, Key):
+        # The caller reads and closes the body, as with a boto3 StreamingBody
+        return {"Body": open(self.object_path(Bucket, Key), "rb")}
+
+class ObjectStoreSink:
+    # Any client with the boto3 put_object/get_object signature works; the local store is the default
+    kind = "s3"
+
+    def __init__(self, bucket=DEFAULT_BUCKET, prefix="", client=None):
+        self.bucket = bucket
+        self.target = bucket
+        self.prefix = prefix
+        self.client = client or LocalObjectStore()
+
+    def key(self, name):
+        return f"{self.prefix}{name}"
+
+    def write_batch(self, documents):
+        for name, data in documents:
+            self.client.put_object(Bucket=self.bucket, Key=self.key(name), Body=data, ContentType="application/pdf")
+        if isinstance(self.client, LocalObjectStore):
+            self.client.sync_objects(Bucket=self.bucket, Keys=[self.key(name) for name, data in documents])
+        return [self.location(name) for name, data in documents]
+
+    def location(self, name):
+        return f"s3://{self.bucket}/{self.key(name)}"
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except (OSError, KeyError):
+            return False
+        return True
+
+    def read(self, name):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(name))
+        except (OSError, KeyError):
+            return None
+        body = response["Body"]
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    def read_batch(self, names):
+        for name in names:
+            data = self.read(name)
+            if data is not None:
+                yield name, data
+
+SINKS = {
+    "filesystem": FileSystemSink,
+    "zip": ZipSink,
+    "sqlite": SqliteSink,
+    "s3": ObjectStoreSink,
+}
+
+def create_sink(kind="filesystem", location=None):
+    if kind not in SINKS:
+        raise ValueError(f"Unknown PDF sink: {kind}")
+    return SINKS[kind](location) if location else SINKS[kind]()
+
+def local_path(sink, name):
+    # A path the OS can open: the file itself for the file system sink, a temporary copy for the others
+    if isinstance(sink, FileSystemSink):
+        return sink.location(name)
+    data = sink.read(name)
+    if data is None:
+        raise LookupError(f"{sink.location(name)} does not exist")
+    os.makedirs(OPEN_DIR, exist_ok=True)
+    path = os.path.join(OPEN_DIR, os.path.basename(name))
+    with open(path + ".tmp", "wb") as file:
+        file.write(data)
+    os.replace(path + ".tmp", path)
+    return path
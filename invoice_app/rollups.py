@@ -0,0 +1,100 @@
+import numpy as np
+from money import grouped_sum, line_amounts
+
+ROLLUP_PERIODS = {
+    "daily": ("sales_daily", "day", 10),
+    "monthly": ("sales_monthly", "month", 7),
+    "yearly": ("sales_yearly", "year", 4),
+}
+
+def create_rollup_tables(cursor):
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'sales_by_product'")
+    row = cursor.fetchone()
+    exists = row is not None
+    if exists and "amount_paise" not in row[0]:
+        # Rollups from before amounts were kept in paise are rebuilt from the invoices
+        for table in [table for table, _, _ in ROLLUP_PERIODS.values()] + ["sales_by_product"]:
+            cursor.execute(f"DROP TABLE {table}")
+        exists = False
+    
+    for table, key, _ in ROLLUP_PERIODS.values():
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                            {key} TEXT PRIMARY KEY,
+                            total_paise INTEGER NOT NULL DEFAULT 0,
+                            invoice_count INTEGER NOT NULL DEFAULT 0)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS sales_by_product (
+                        product TEXT PRIMARY KEY,
+                        quantity INTEGER NOT NULL DEFAULT 0,
+                        amount_paise INTEGER NOT NULL DEFAULT 0)''')
+    
+    if not exists:
+        rebuild_rollups(cursor)
+
+def upsert_period_rows(cursor, table, key, rows):
+    cursor.executemany(f'''INSERT INTO {table} ({key}, total_paise, invoice_count) VALUES (?, ?, ?)
+                           ON CONFLICT({key}) DO UPDATE SET total_paise = total_paise + excluded.total_paise,
+                                                            invoice_count = invoice_count + excluded.invoice_count''', rows)
+
+def upsert_product_rows(cursor, rows):
+    cursor.executemany('''INSERT INTO sales_by_product (product, quantity, amount_paise) VALUES (?, ?, ?)
+                          ON CONFLICT(product) DO UPDATE SET quantity = quantity + excluded.quantity,
+                                                             amount_paise = amount_paise + excluded.amount_paise''', rows)
+
+def add_to_rollups(cursor, invoices):
+    # invoices: sequence of (date_time, total, items) with items starting (product, quantity, price), amounts
+    # in paise. Grouped with int64 NumPy sums so a whole batch costs one upsert per distinct key
+    if not invoices:
+        return
+    dates = np.array([date_time for date_time, _, _ in invoices], dtype=str)
+    totals = np.array([total for _, total, _ in invoices], dtype=np.int64)
+    ones = np.ones(len(invoices), dtype=np.int64)
+    for table, key, length in ROLLUP_PERIODS.values():
+        # Casting to a shorter string dtype truncates, giving the day / month / year prefix
+        keys, sums, counts = grouped_sum(dates.astype(f"<U{length}"), totals, ones)
+        upsert_period_rows(cursor, table, key, list(zip(keys.tolist(), sums.tolist(), counts.tolist())))
+    
+    lines = [item for _, _, items in invoices for item in items]
+    if lines:
+        products, quantities, prices, *_ = zip(*lines)
+        keys, quantity_sums, amount_sums = grouped_sum(np.array(products, dtype=str), quantities, line_amounts(quantities, prices))
+        upsert_product_rows(cursor, list(zip(keys.tolist(), quantity_sums.tolist(), amount_sums.tolist())))
+
+def remove_from_rollups(cursor, where, params):
+    # Subtracts the invoices matching "where" (a condition on the invoices table) before they are moved out
+    for table, key, length in ROLLUP_PERIODS.values():
+        cursor.execute(f'''SELECT substr(date_time, 1, {length}), -SUM(total_paise), -COUNT(*) FROM invoices
+                           WHERE ({where}) AND date_time IS NOT NULL GROUP BY 1''', params)
+        upsert_period_rows(cursor, table, key, cursor.fetchall())
+        cursor.execute(f"DELETE FROM {table} WHERE invoice_count <= 0")
+    
+    cursor.execute(f'''SELECT product, -SUM(quantity), -SUM(quantity * price_paise) FROM invoice_items
+                       WHERE invoice_id IN (SELECT id FROM invoices WHERE {where}) GROUP BY product''', params)
+    upsert_product_rows(cursor, cursor.fetchall())
+    cursor.execute("DELETE FROM sales_by_product WHERE quantity <= 0")
+
+def rebuild_rollups(cursor):
+    for table, key, length in ROLLUP_PERIODS.values():
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(f'''INSERT INTO {table} ({key}, total_paise, invoice_count)
+                           SELECT substr(date_time, 1, {length}), SUM(total_paise), COUNT(*) FROM invoices
+                           WHERE date_time IS NOT NULL GROUP BY 1''')
+    
+    cursor.execute("DELETE FROM sales_by_product")
+    cursor.execute('''INSERT INTO sales_by_product (product, quantity, amount_paise)
+                      SELECT product, SUM(quantity), SUM(quantity * price_paise) FROM invoice_items
+                      WHERE invoice_id IN (SELECT id FROM invoices) GROUP BY product''')
+
+def fetch_rollup(cursor, period):
+    table, key, _ = ROLLUP_PERIODS[period]
+    cursor.execute(f"SELECT {key}, total_paise FROM {table} ORDER BY {key}")
+    return cursor.fetchall()
+
+def fetch_product_rollup(cursor):
+    cursor.execute("SELECT product, amount_paise FROM sales_by_product ORDER BY product")
+    return cursor.fetchall()
+
+def fetch_monthly_increase(cursor):
+    # The first month has no predecessor, so it is compared with itself (an increase of 0)
+    cursor.execute('''SELECT month, total_paise - LAG(total_paise, 1, total_paise) OVER (ORDER BY month) FROM sales_monthly
+                      ORDER BY month''')
+    return cursor.fetchall()
\ No newline at end of file
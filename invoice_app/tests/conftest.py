@@ -0,0 +1,30 @@
+import os
+import sys
+import shutil
+import tempfile
+import pytest
+
+# The app keeps its data under ~/Desktop/Invoices, fixed at import time, so tests get a throwaway home
+# before any app module is imported
+HOME = tempfile.mkdtemp(prefix="invoice_app_tests_")
+os.environ["HOME"] = os.environ["USERPROFILE"] = HOME
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def fresh_db():
+    # An empty storage directory and a newly initialized database, for tests that count rows or archive everything
+    from utils import STORAGE_DIR
+    from connection import close_connection
+    from pdf_renderer import invalidate_org_header_cache
+    from database import init_db
+    close_connection()
+    invalidate_org_header_cache()
+    for name in os.listdir(STORAGE_DIR):
+        path = os.path.join(STORAGE_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    init_db()
+    yield
+    close_connection()
@@ -0,0 +1,102 @@
+import os
+from utils import ARCHIVE_DB_PATH
+from connection import get_connection, transaction
+from rollups import fetch_rollup, fetch_product_rollup, rebuild_rollups
+from archive_db import migrate_legacy_archive
+from archive_operations import archive_batch, archive_period, pending_archives, run_archive, start_archive
+from archive_pdfs import extract_archived_pdf
+from invoice_draft import InvoiceDraft, save_draft
+from pdf_renderer import generate_pdf
+from pdf_sinks import FileSystemSink, ZipSink, SqliteSink, ObjectStoreSink
+
+def save_invoices(count, invoice_date="2020-01-15"):
+    return [save_draft(InvoiceDraft(f"Customer {n}", invoice_date=invoice_date, items=[("Pen", 1, 1000)]))[0] for n in range(count)]
+
+def create_legacy_archive():
+    # The archive tables as releases before the separate archive database kept them in invoices.db
+    with transaction() as cursor:
+        cursor.execute('''CREATE TABLE archived_invoices (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            customer TEXT,
+                            total REAL,
+                            invoice_number TEXT,
+                            invoice_date TEXT,
+                            customer_email TEXT,
+                            customer_contact TEXT,
+                            archive_timestamp TEXT)''')
+        cursor.execute('''CREATE TABLE archive_backups (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            archive_timestamp TEXT)''')
+        cursor.executemany("INSERT INTO archived_invoices (customer, total, invoice_number, invoice_date, archive_timestamp) VALUES (?, ?, ?, ?, ?)",
+                           [("Old", 10.5, f"OLD-{n}", "2019-01-01", "2019-06-01 00:00:00") for n in range(3)])
+        cursor.execute("INSERT INTO archive_backups (archive_timestamp) VALUES ('2019-06-01 00:00:00')")
+
+def test_archive_after_legacy_migration_counts_every_invoice(fresh_db):
+    create_legacy_archive()
+    migrate_legacy_archive()
+    save_invoices(5)
+    progress = []
+    assert archive_period("all_data", progress=lambda moved, total: progress.append((moved, total)), batch_size=2) == 5
+    assert progress == [(0, 5), (2, 5), (4, 5), (5, 5)]
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT COUNT(*), COUNT(original_id) FROM archive.archived_invoices")
+    assert cursor.fetchone() == (8, 5)
+
+def test_archived_pdfs_are_packed_from_every_sink(fresh_db, tmp_path):
+    invoice_ids = save_invoices(4)
+    sinks = [FileSystemSink(), ZipSink(str(tmp_path / "invoices.zip")), SqliteSink(str(tmp_path / "pdfs.db")), ObjectStoreSink()]
+    locations = [generate_pdf(invoice_id, sink=sink) for invoice_id, sink in zip(invoice_ids, sinks)]
+    archive_period("all_data")
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT id FROM archive.archived_invoices ORDER BY original_id")
+    for (archived_id,) in cursor.fetchall():
+        with open(extract_archived_pdf(archived_id), "rb") as file:
+            assert file.read(4) == b"%PDF"
+    # Loose files are removed once packed; the other sinks keep their copies
+    assert not os.path.exists(locations[0])
+
+def test_archive_is_attached_on_demand(fresh_db):
+    assert pending_archives() == []
+    cursor = get_connection().cursor()
+    cursor.execute("PRAGMA database_list")
+    assert [row[1] for row in cursor.fetchall()] == ["main"]
+    assert not os.path.exists(ARCHIVE_DB_PATH)
+
+def rollups():
+    cursor = get_connection().cursor()
+    return [fetch_rollup(cursor, period) for period in ("daily", "monthly", "yearly")], fetch_product_rollup(cursor)
+
+def test_rollups_after_archiving_match_a_rebuild(fresh_db):
+    save_invoices(3, "2020-01-15")
+    save_draft(InvoiceDraft("Recent", items=[("Pen", 2, 1000), ("Ink", 1, 500)]))
+    archive_period("last_year")
+    archived = rollups()
+    with transaction() as cursor:
+        rebuild_rollups(cursor)
+    assert archived == rollups()
+    assert archived[1] == [("Ink", 500), ("Pen", 2000)]
+
+def test_interrupted_archive_resumes_with_its_progress(fresh_db):
+    save_invoices(5)
+    archive_timestamp = start_archive("all_data")
+    assert archive_batch(archive_timestamp, None, 5, batch_size=2) == (2, 2)
+    assert pending_archives() == [archive_timestamp]
+    progress = []
+    assert run_archive(archive_timestamp, lambda moved, total: progress.append((moved, total)), batch_size=2) == 5
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    assert pending_archives() == []
+
+def test_replayed_batch_is_not_counted_twice(fresh_db):
+    save_invoices(3)
+    archive_timestamp = start_archive("all_data")
+    # A batch copied into the archive whose removal from the live database never committed
+    with transaction() as cursor:
+        cursor.execute('''INSERT INTO archive.archived_invoices (original_id, customer, total_paise, invoice_number, archive_timestamp)
+                          SELECT id, customer, total_paise, invoice_number, ? FROM main.invoices ORDER BY id LIMIT 2''', (archive_timestamp,))
+        cursor.execute("UPDATE archive.archive_backups SET moved = 2 WHERE archive_timestamp = ?", (archive_timestamp,))
+    progress = []
+    assert run_archive(archive_timestamp, lambda moved, total: progress.append((moved, total)), batch_size=2) == 3
+    assert progress == [(2, 3), (2, 3), (3, 3)]
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT COUNT(*) FROM main.invoices")
+    assert cursor.fetchone()[0] == 0
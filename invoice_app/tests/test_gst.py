@@ -0,0 +1,41 @@
+import pytest
+from gst import RateTable, compute_gst, normalize_hsn, state_code, rate_percent
+
+def test_longest_prefix_wins():
+    table = RateTable({"84": 12, "8471": 18, "847130": 28, "99": 18})
+    rates = table.lookup(["84", "84099100", "8471", "84713010", "847150", "9954", "", "30"])
+    assert rates.tolist() == [1200, 1200, 1800, 2800, 1800, 1800, 0, -1]
+    assert table.unknown(["30", "8471", "30"]) == ["30"]
+
+def test_empty_lookups():
+    assert RateTable({"8471": 18}).lookup([]).size == 0
+    assert RateTable({}).lookup(["8471", ""]).tolist() == [-1, 0]
+
+def test_compute_gst_splits_intra_state_and_rounds_half_up():
+    # 8471 is rated 18% in the bundled table; 1 x ₹0.25 carries 4.5 paise of tax
+    rates, cgst, sgst, igst = compute_gst([1, 2, 1], [25, 10000, 500], ["8471", "8471", ""], False)
+    assert rates.tolist() == [1800, 1800, 0]
+    assert cgst.tolist() == [2, 1800, 0] and sgst.tolist() == cgst.tolist()
+    assert igst.tolist() == [0, 0, 0]
+
+def test_compute_gst_interstate_pays_igst():
+    rates, cgst, sgst, igst = compute_gst([1, 2], [25, 10000], ["8471", "8471"], [True, False])
+    assert igst.tolist() == [5, 0]
+    assert cgst.tolist() == [0, 1800]
+
+def test_compute_gst_without_lines():
+    assert [column.size for column in compute_gst([], [], [], True)] == [0, 0, 0, 0]
+
+def test_compute_gst_rejects_unrated_codes():
+    with pytest.raises(ValueError, match="no GST rate"):
+        compute_gst([1], [100], ["30"], False)
+
+def test_codes_and_states():
+    assert normalize_hsn("8471.30 10") == "84713010"
+    with pytest.raises(ValueError):
+        normalize_hsn("8")
+    assert state_code("27aapfu0939f1zv") == "27"
+    assert state_code("") == ""
+    with pytest.raises(ValueError):
+        state_code("MH")
+    assert rate_percent(25) == "0.25" and rate_percent(1800) == "18"
@@ -0,0 +1,16 @@
+import pytest
+from database import init_db
+from connection import get_connection
+from invoice_draft import InvoiceDraft, save_draft
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+def test_empty_draft_saves_with_zero_total():
+    invoice_id, invoice_number, _ = save_draft(InvoiceDraft("Empty"))
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT invoice_number, total_paise, tax_paise FROM invoices WHERE id = ?", (invoice_id,))
+    assert cursor.fetchone() == (invoice_number, 0, 0)
+    cursor.execute("SELECT COUNT(*) FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
+    assert cursor.fetchone()[0] == 0
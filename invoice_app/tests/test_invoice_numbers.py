@@ -0,0 +1,26 @@
+import sqlite3
+import pytest
+from invoice_numbers import create_invoice_sequences, reserve_invoice_numbers
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    create_invoice_sequences(cursor)
+    yield cursor
+    conn.close()
+
+def test_blocks_are_consecutive_across_calls(cursor):
+    assert reserve_invoice_numbers(cursor, 2, "INV-2024") == ["INV-2024-000001", "INV-2024-000002"]
+    assert reserve_invoice_numbers(cursor, 1, "INV-2024") == ["INV-2024-000003"]
+    assert reserve_invoice_numbers(cursor, 3, "INV-2024") == ["INV-2024-000004", "INV-2024-000005", "INV-2024-000006"]
+
+def test_each_prefix_has_its_own_sequence(cursor):
+    reserve_invoice_numbers(cursor, 5, "INV-2024")
+    assert reserve_invoice_numbers(cursor, 1, "INV-2025") == ["INV-2025-000001"]
+
+def test_rolled_back_block_is_handed_back(cursor):
+    cursor.connection.commit()
+    reserve_invoice_numbers(cursor, 4, "INV-2024")
+    cursor.connection.rollback()
+    assert reserve_invoice_numbers(cursor, 1, "INV-2024") == ["INV-2024-000001"]
@@ -0,0 +1,26 @@
+import pytest
+from line_items import LineItems
+
+def test_running_total_follows_changes():
+    items = LineItems([("Pen", 2, 1050, "9608"), ("Book", 1, 30000, "4901")])
+    events = []
+    items.subscribe(lambda event, index: events.append((event, index)))
+    assert items.total == 32100
+    assert items.pop(0) == ("Pen", 2, 1050, "9608")
+    assert items.pop(0) == ("Book", 1, 30000, "4901")
+    assert items.total == 0 and len(items) == 0
+    assert events == [("delete", 0), ("delete", 0)]
+
+def test_overflowing_price_leaves_columns_aligned():
+    items = LineItems([("Pen", 1, 1000, "")])
+    with pytest.raises(OverflowError):
+        items.append("Gold", 1, 2 ** 63)
+    assert len(items.products) == len(items.quantities) == len(items.prices) == len(items.hsn_codes) == 1
+    assert items.total == 1000
+    items.append("Ink", 3, 500)
+    assert list(items) == [("Pen", 1, 1000, ""), ("Ink", 3, 500, "")]
+
+def test_clear_resets_total():
+    items = LineItems([("Pen", 1, 1000, "")])
+    items.clear()
+    assert items.total == 0 and list(items) == []
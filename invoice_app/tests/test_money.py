@@ -0,0 +1,38 @@
+from decimal import Decimal
+import numpy as np
+import pytest
+from money import MAX_PAISE, to_paise, from_paise, format_rupees, line_amount, grouped_sum, segment_sums
+
+@pytest.mark.parametrize("value, paise", [("12.5", 1250), ("1.005", 101), ("0.004", 0), (" 7 ", 700), (Decimal("2.675"), 268)])
+def test_to_paise_rounds_half_up(value, paise):
+    assert to_paise(value) == paise
+
+@pytest.mark.parametrize("value", ["abc", "", "nan", "inf"])
+def test_to_paise_rejects_non_amounts(value):
+    with pytest.raises(ValueError):
+        to_paise(value)
+
+def test_to_paise_rejects_amounts_past_the_int64_bound():
+    assert to_paise(MAX_PAISE // 100) == MAX_PAISE
+    with pytest.raises(ValueError, match="too large"):
+        to_paise(MAX_PAISE // 100 + 1)
+
+def test_line_amount_is_bounded():
+    assert line_amount(3, 1050) == 3150
+    with pytest.raises(ValueError, match="too large"):
+        line_amount(2, MAX_PAISE)
+
+def test_from_paise_is_exact():
+    assert from_paise(101) == Decimal("1.01")
+    assert format_rupees(12345678) == "₹123,456.78"
+
+def test_grouped_sum():
+    keys, sums = grouped_sum(["b", "a", "b"], [1, 2, 3])
+    assert keys.tolist() == ["a", "b"] and sums.tolist() == [2, 4]
+    keys, sums = grouped_sum(np.array([], dtype=str), [])
+    assert keys.size == 0 and sums.size == 0
+
+def test_segment_sums_handles_empty_runs():
+    assert segment_sums([1, 2, 3, 4], [2, 0, 2]).tolist() == [3, 0, 7]
+    assert segment_sums([], [0, 0]).tolist() == [0, 0]
+    assert segment_sums([], []).tolist() == []
@@ -0,0 +1,67 @@
+import os
+from io import BytesIO
+import pytest
+import pdf_renderer
+from connection import get_connection, transaction
+from invoice_draft import InvoiceDraft, save_draft
+from pdf_renderer import build_invoice_pdf, ensure_invoice_pdf, fetch_render_record, generate_pdf, get_org_header
+from pdf_sinks import ZipSink
+
+def sample_items(count):
+    return [(f"Product {index}", 1, 1000, "", 0, 0, 0, 0) for index in range(count)]
+
+@pytest.fixture
+def renders(monkeypatch):
+    # Counts the PDFs ensure_invoice_pdf actually renders
+    stored = []
+    store_invoice_pdf = pdf_renderer.store_invoice_pdf
+    def counting_store(invoice_id, *args, **kwargs):
+        stored.append(invoice_id)
+        return store_invoice_pdf(invoice_id, *args, **kwargs)
+    monkeypatch.setattr(pdf_renderer, "store_invoice_pdf", counting_store)
+    return stored
+
+@pytest.mark.parametrize("template", ["default", "compact"])
+def test_short_invoices_take_the_canvas_path(fresh_db, template):
+    org_header = get_org_header(get_connection().cursor(), template)
+    output = BytesIO()
+    assert build_invoice_pdf(output, sample_items(5), org_header, "Customer", 5000, "INV-1", "2024-01-01") is True
+    assert output.getvalue().startswith(b"%PDF")
+    assert build_invoice_pdf(BytesIO(), sample_items(5), org_header, "Customer", 5000, "INV-1", "2024-01-01", fast=False) is False
+
+def test_long_invoices_fall_back_to_platypus(fresh_db):
+    org_header = get_org_header(get_connection().cursor())
+    output = BytesIO()
+    assert build_invoice_pdf(output, sample_items(80), org_header, "Customer", 80000, "INV-1", "2024-01-01") is False
+    assert output.getvalue().startswith(b"%PDF")
+
+def test_render_key_hit_and_miss(fresh_db, renders):
+    invoice_id, _, _ = save_draft(InvoiceDraft("Asha Traders", invoice_date="2024-03-05", items=[("Pen", 2, 1050)]))
+    path = generate_pdf(invoice_id)
+    renders.clear()
+    key = fetch_render_record(get_connection().cursor(), invoice_id)[0]
+
+    assert ensure_invoice_pdf(invoice_id) == path
+    assert renders == []
+
+    with transaction() as cursor:
+        cursor.execute("UPDATE invoices SET customer = 'Asha Traders Pvt Ltd' WHERE id = ?", (invoice_id,))
+    assert ensure_invoice_pdf(invoice_id) == path
+    assert renders == [invoice_id]
+    assert fetch_render_record(get_connection().cursor(), invoice_id)[0] != key
+
+    os.remove(path)
+    ensure_invoice_pdf(invoice_id)
+    assert renders == [invoice_id, invoice_id] and os.path.exists(path)
+
+def test_stale_pdf_is_rendered_into_its_own_sink_and_template(fresh_db, renders, tmp_path):
+    invoice_id, _, pdf_path = save_draft(InvoiceDraft("Ravi Stores", items=[("Ink", 1, 500)]))
+    sink = ZipSink(str(tmp_path / "invoices.zip"))
+    generate_pdf(invoice_id, template="compact", sink=sink)
+    renders.clear()
+    with transaction() as cursor:
+        cursor.execute("UPDATE invoices SET customer_email = 'ravi@example.com' WHERE id = ?", (invoice_id,))
+    ensure_invoice_pdf(invoice_id)
+    assert renders == [invoice_id]
+    assert fetch_render_record(get_connection().cursor(), invoice_id)[1:] == ("compact", "zip", sink.target)
+    assert sink.exists(pdf_path)
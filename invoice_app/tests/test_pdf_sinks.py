@@ -0,0 +1,54 @@
+import os
+import pytest
+from pdf_sinks import FileSystemSink, ZipSink, SqliteSink, ObjectStoreSink, LocalObjectStore, create_sink, local_path
+
+SINKS = {
+    "filesystem": lambda tmp_path: FileSystemSink(str(tmp_path / "pdfs")),
+    "zip": lambda tmp_path: ZipSink(str(tmp_path / "invoices.zip")),
+    "sqlite": lambda tmp_path: SqliteSink(str(tmp_path / "invoice_pdfs.db")),
+    "s3": lambda tmp_path: ObjectStoreSink(client=LocalObjectStore(str(tmp_path / "store"))),
+}
+
+@pytest.fixture(params=sorted(SINKS))
+def sink(request, tmp_path):
+    return SINKS[request.param](tmp_path)
+
+def test_round_trip(sink):
+    assert not sink.exists("2024/01/invoice_A.pdf")
+    assert sink.read("2024/01/invoice_A.pdf") is None
+    sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-a"), ("2024/02/invoice_B.pdf", b"%PDF-b")])
+    assert sink.exists("2024/01/invoice_A.pdf") and sink.exists("2024/02/invoice_B.pdf")
+    assert sink.read("2024/02/invoice_B.pdf") == b"%PDF-b"
+    assert list(sink.read_batch(["2024/01/invoice_A.pdf", "2024/03/invoice_C.pdf"])) == [("2024/01/invoice_A.pdf", b"%PDF-a")]
+
+def test_rewrite_replaces_stored_pdf(sink):
+    sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-old"), ("2024/01/invoice_B.pdf", b"%PDF-b")])
+    sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-new")])
+    assert sink.read("2024/01/invoice_A.pdf") == b"%PDF-new"
+    assert sink.read("2024/01/invoice_B.pdf") == b"%PDF-b"
+
+def test_local_path_opens_stored_pdf(sink):
+    sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-a")])
+    with open(local_path(sink, "2024/01/invoice_A.pdf"), "rb") as file:
+        assert file.read() == b"%PDF-a"
+
+def test_local_path_of_missing_pdf(sink):
+    # The file system path is returned as is; the other sinks have nothing to copy out
+    if sink.kind == "filesystem":
+        assert not os.path.exists(local_path(sink, "2024/01/invoice_missing.pdf"))
+    else:
+        with pytest.raises(LookupError):
+            local_path(sink, "2024/01/invoice_missing.pdf")
+
+def test_create_sink_reopens_recorded_target(tmp_path):
+    for kind in ("filesystem", "zip", "sqlite"):
+        sink = SINKS[kind](tmp_path)
+        sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-a")])
+        assert create_sink(sink.kind, sink.target).read("2024/01/invoice_A.pdf") == b"%PDF-a"
+    with pytest.raises(ValueError):
+        create_sink("ftp")
+
+def test_file_system_batch_leaves_no_staging_files(tmp_path):
+    sink = FileSystemSink(str(tmp_path))
+    sink.write_batch([("2024/01/invoice_A.pdf", b"%PDF-a")])
+    assert os.listdir(tmp_path / "2024" / "01") == ["invoice_A.pdf"]
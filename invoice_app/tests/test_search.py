@@ -0,0 +1,35 @@
+from database import PagedSource, count_invoices, search_invoices
+from invoice_draft import InvoiceDraft, save_draft
+
+def save_invoice(customer, invoice_date, product="Pen"):
+    return save_draft(InvoiceDraft(customer, invoice_date=invoice_date, items=[(product, 1, 1000)]))
+
+def test_filters(fresh_db):
+    save_invoice("Asha Traders", "2024-03-05")
+    _, number, _ = save_invoice("Ravi Stores", "2024-03-28 10:15:00")
+    save_invoice("Asha Traders", "2024-04-01")
+    assert count_invoices({"invoice_date": "2024"}) == 3
+    assert count_invoices({"invoice_date": "2024-03"}) == 2
+    assert count_invoices({"invoice_date": "2024-03-2"}) == 1
+    assert count_invoices({"invoice_number": number[-6:]}) == 1
+    assert count_invoices({"invoice_number": "50%"}) == 0
+    rows, _ = search_invoices({"text": "asha", "invoice_date": "2024-04"})
+    assert [row[4] for row in rows] == ["2024-04-01"]
+
+def test_keyset_pages_have_no_duplicates_or_gaps(fresh_db):
+    invoice_ids = [save_invoice(f"Customer {n}", "2024-03-05")[0] for n in range(25)]
+    filters = {}
+    source = PagedSource(lambda after, offset, limit: search_invoices(filters, after, limit, offset), lambda: count_invoices(filters), page_size=10)
+    assert source.count() == 25
+    assert [row[0] for row in source.fetch(0, 25)] == invoice_ids[::-1]
+    # A window straddling two pages, read after the pages have been walked in order
+    assert [row[0] for row in source.fetch(8, 5)] == invoice_ids[::-1][8:13]
+
+def test_ranked_pages_have_no_duplicates_or_gaps(fresh_db):
+    invoice_ids = [save_invoice(f"Asha {'Traders ' * (n % 3)}{n}", "2024-03-05")[0] for n in range(12)]
+    seen = []
+    rows, after = search_invoices({"text": "asha"}, limit=5)
+    while rows:
+        seen.extend(row[0] for row in rows)
+        rows, after = search_invoices({"text": "asha"}, after, limit=5)
+    assert sorted(seen) == invoice_ids
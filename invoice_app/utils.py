@@ -4,6 +4,9 @@ import os
 STORAGE_DIR = os.path.join(os.path.expanduser("~"), "Desktop", "Invoices")
 os.makedirs(STORAGE_DIR, exist_ok=True)
 DB_PATH = os.path.join(STORAGE_DIR, "invoices.db")
+ARCHIVE_DB_PATH = os.path.join(STORAGE_DIR, "archive.db")
+ARCHIVE_EXPORT_DIR = os.path.join(STORAGE_DIR, "archive_exports")
+ARCHIVE_PDF_DIR = os.path.join(STORAGE_DIR, "archive_pdfs")
 FONT = ("Calibri", 12)
 HEADER_FONT = ("Calibri", 14, "bold")
 BUTTON_FONT = ("Calibri", 12)